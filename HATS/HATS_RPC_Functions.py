@@ -1,9 +1,306 @@
 import serial, time
+import asyncio
+import binascii
+import functools
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 ###Port set-up
 port = str
 pc = None
+### Default session, used by RPC_init and the RPC_*arg functions
+session = None
+
+### Reply framing: a reply ends once the expected number of lines ending with terminator arrived,
+### or, without an expected number, once no line arrived for reply_idle (s) after the first one.
+### reply_timeout (s) is the wait for the first line.
+terminator = b'\n'
+reply_timeout = 1
+reply_idle = 0.05
+
+### Binary framing: SYNC, 2 byte payload length, payload, CRC-16/CCITT (init 0xFFFF) of length + payload.
+### Command payloads are length-prefixed fields "/name/cmd", arg1, ..., reply payloads are the reply text.
+SYNC = 0xA5
+MAX_FIELD = 255
+### Target functions to switch to binary framing and to change the baud rate
+BINARY_COMMAND = ['RPC_binary', 'run']
+BAUD_COMMAND = ['RPC_baud', 'run']
+
+### Open sessions, keyed by port name
+sessions = dict()
+_sessions_lock = threading.Lock()
+
+class RPCReply(str):
+    """
+    Reply of an RPC call. Compares and prints as the reply text, parsed lines are in .lines
+    """
+    def __new__(cls, lines, complete=True):
+        reply = str.__new__(cls, '\n'.join(lines))
+        reply.lines = lines
+        reply.complete = complete
+        return reply
+
+    @property
+    def value(self):
+        """
+        Last line of the reply, the return value of the RPC function
+        """
+        return self.lines[-1] if self.lines else ''
+
+def _command(command):
+    """
+    Build a command frame from "/name/cmd args" or [name, cmd, arg1, ...]
+    """
+    if isinstance(command, str):
+        return bytes(command.rstrip() + ' \n', 'utf-8')
+    name, cmd = command[0], command[1]
+    data = '/' + str(name) + '/' + str(cmd)
+    for val in command[2:]:
+        data = data + ' ' + str(val)
+    return bytes(data + ' \n', 'utf-8')
+
+def _fields(command):
+    """
+    Split a command given as str, bytes or [name, cmd, args...] into "/name/cmd" and its args
+    """
+    if isinstance(command, bytes):
+        command = command.decode('utf-8')
+    if isinstance(command, str):
+        tokens = command.split()
+        return tokens[0], tokens[1:]
+    return '/' + str(command[0]) + '/' + str(command[1]), list(command[2:])
+
+def _frame(payload):
+    body = struct.pack('>H', len(payload)) + bytes(payload)
+    return bytes([SYNC]) + body + struct.pack('>H', binascii.crc_hqx(body, 0xFFFF))
+
+def _binary_command(command):
+    """
+    Build a binary command frame, bytes args are sent raw (up to MAX_FIELD bytes each)
+    """
+    head, args = _fields(command)
+    payload = bytearray()
+    for val in [head] + args:
+        data = bytes(val) if isinstance(val, (bytes, bytearray)) else str(val).encode('utf-8')
+        if len(data) > MAX_FIELD:
+            raise ValueError("Field longer than {} bytes".format(MAX_FIELD))
+        payload.append(len(data))
+        payload += data
+    return _frame(payload)
+
+
+### One Mbed board on one serial port. Calls on a session are serialized by its lock,
+### separate sessions can be driven from separate threads in parallel.
+### The a* methods are asyncio counterparts, run on a worker thread of the session.
+class RPCSession():
+    def __init__(self, port, baudrate=9600, timeout=reply_timeout):
+        self.port = port
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        self.binary = False
+        self._executor = None
+        self.pc = serial.Serial(port,baudrate=baudrate,timeout=timeout)
+
+    def _run(self, func, *args, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def asend(self, command, lines=None):
+        """
+        asyncio counterpart of send()
+        """
+        return await self._run(self.send, command, lines)
+
+    async def acall(self, name, cmd, *args, lines=None):
+        """
+        asyncio counterpart of call(), e.g. await session.acall("I2C_scan", "run")
+        """
+        return await self._run(self.call, name, cmd, *args, lines=lines)
+
+    async def abatch(self, commands, window=4):
+        """
+        asyncio counterpart of batch()
+        """
+        return await self._run(self.batch, commands, window)
+
+    def _read_exact(self, n, deadline):
+        pc = self.pc
+        data = bytearray()
+        while len(data) < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            pc.timeout = remaining
+            data += pc.read(n - len(data))
+        return bytes(data)
+
+    def read_frame(self):
+        """
+        Read one binary reply frame, incomplete if it timed out or the CRC does not match
+        """
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                b = self._read_exact(1, deadline)
+                if not b:
+                    return RPCReply([], False)
+                if b[0] == SYNC:
+                    break
+            header = self._read_exact(2, deadline)
+            if len(header) < 2:
+                return RPCReply([], False)
+            payload = self._read_exact(struct.unpack('>H', header)[0], deadline)
+            crc = self._read_exact(2, deadline)
+        finally:
+            self.pc.timeout = self.timeout
+        lines = [l.strip() for l in payload.decode('utf-8','replace').splitlines() if l.strip()]
+        if len(crc) < 2 or struct.unpack('>H', crc)[0] != binascii.crc_hqx(header + payload, 0xFFFF):
+            return RPCReply(lines, False)
+        return RPCReply(lines, True)
+
+    def read_reply(self, lines=None, drain=True):
+        """
+        Read reply lines: wait up to the timeout for the first non-empty line, then keep reading
+        until no line arrived for reply_idle (s) or lines non-empty lines arrived.
+        With drain, input that already arrived after them is added too.
+        """
+        pc = self.pc
+        deadline = time.monotonic() + self.timeout
+        reply = []
+        complete = True
+        try:
+            # pc.timeout is self.timeout until the first line, then the idle gap that ends the reply
+            while lines is None or len(reply) < lines:
+                line = pc.read_until(terminator)
+                if not line.endswith(terminator):
+                    if line.strip():
+                        complete = False
+                        reply.append(line.decode('utf-8','replace').strip())
+                    break
+                line = line.decode('utf-8','replace').strip()
+                if line:
+                    if not reply:
+                        pc.timeout = reply_idle
+                    reply.append(line)
+                elif not reply and time.monotonic() >= deadline:
+                    break
+            if not reply or (lines is not None and len(reply) < lines):
+                complete = False
+            # Take whatever else already arrived, without waiting
+            waiting = pc.in_waiting if drain else 0
+            if waiting:
+                extra = pc.read(waiting).decode('utf-8','replace')
+                reply.extend(l.strip() for l in extra.split(terminator.decode()) if l.strip())
+        finally:
+            pc.timeout = self.timeout
+        return RPCReply(reply, complete)
+
+    def send(self, command, lines=None):
+        """
+        Send one command, "/name/cmd args" or [name, cmd, args...], and return its reply
+        """
+        with self.lock:
+            # Drop leftovers of earlier replies so they are not taken as this reply
+            self.pc.reset_input_buffer()
+            if self.binary:
+                # A bare newline has no binary equivalent
+                if isinstance(command, (bytes, str)) and not command.strip():
+                    return RPCReply([])
+                self.pc.write(_binary_command(command))
+                return self.read_frame()
+            self.pc.write(command if isinstance(command, bytes) else _command(command))
+            return self.read_reply(lines)
+
+    def call(self, name, cmd, *args, lines=None):
+        """
+        Call an RPC function, e.g. call("I2C_setup", "run", "PB_9", "PB_8")
+        """
+        return self.send([name, cmd] + list(args), lines)
+
+    def batch(self, commands, window=4):
+        """
+        Pipeline a list of commands, each is expected to answer with one line.
+        window is the max number of commands sent but not yet answered.
+        """
+        if self.binary:
+            frames = [_binary_command(c) for c in commands]
+            read = self.read_frame
+        else:
+            frames = [_command(c) for c in commands]
+            read = lambda: self.read_reply(1, drain=False)
+        window = max(1, int(window))
+        replies = []
+        sent = 0
+        with self.lock:
+            self.pc.reset_input_buffer()
+            while len(replies) < len(frames):
+                while sent < len(frames) and sent - len(replies) < window:
+                    self.pc.write(frames[sent])
+                    sent += 1
+                replies.append(read())
+        return replies
+
+    def enable_binary(self):
+        """
+        Ask the target to switch to binary framing, stays in ASCII mode if it does not answer with a valid frame
+        """
+        with self.lock:
+            self.pc.reset_input_buffer()
+            self.pc.write(_binary_command(BINARY_COMMAND))
+            self.binary = self.read_frame().complete
+            if not self.binary:
+                # An ASCII-only target holds the frame bytes as the start of a line,
+                # end that line and drop its error reply so the next command is not corrupted
+                self.pc.write(terminator)
+                self.read_reply(1)
+                self.pc.reset_input_buffer()
+            return self.binary
+
+    def set_baudrate(self, baudrate, negotiate=True):
+        """
+        Change the baud rate. With negotiate, the target is told to switch first (BAUD_COMMAND)
+        and the new rate is checked with a second BAUD_COMMAND, reverting to the old rate on failure.
+        """
+        baudrate = int(baudrate)
+        with self.lock:
+            old = self.pc.baudrate
+            if negotiate and not self.send(BAUD_COMMAND + [baudrate]).complete:
+                return False
+            self.pc.baudrate = baudrate
+            if negotiate and not self.send(BAUD_COMMAND + [baudrate]).complete:
+                self.pc.baudrate = old
+                return False
+            return True
+
+    def readlines(self):
+        with self.lock:
+            return str(self.pc.read(2048))
+
+    def close(self):
+        with self.lock:
+            self.pc.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+def get_session(serial_port, baudrate=None):
+    """
+    Get the open session of a port, opening it if needed (at 9600 baud unless baudrate is given).
+    A baudrate different from the one of an open session is applied to it.
+    """
+    with _sessions_lock:
+        s = sessions.get(serial_port)
+        if s is None or not s.pc.is_open:
+            s = RPCSession(serial_port, 9600 if baudrate is None else int(baudrate))
+            sessions[serial_port] = s
+        elif baudrate is not None and s.pc.baudrate != int(baudrate):
+            s.set_baudrate(baudrate, negotiate=False)
+        return s
+
 
 ### Function to set communication port
 def RPC_setport(serial_port):
@@ -17,75 +314,108 @@ def RPC_getport():
     return ("Port in use: ",port)
 
 ### Function to initialise chosen communication port
-def RPC_init():
-    global pc, port
-    pc = serial.Serial(port,baudrate=9600,timeout=1)
+### The port opens at 9600 baud, an already open session keeps its rate unless baudrate is given
+def RPC_init(baudrate=None):
+    global pc, port, session
+    session = get_session(port, baudrate)
+    pc = session.pc
     return("Initialized")
 
+def _lines(lines):
+    # Robot passes numbers as strings, None reads until the reply goes idle
+    return None if lines is None else int(lines)
+
 ### Basic RPC Function for all different number of inputs
-def RPC_0arg(name,cmd):
-    global pc
+### lines: number of reply lines to wait for, by default every line until the reply goes idle
+def RPC_0arg(name, cmd, lines=None):
     data = '/' + str(name) + '/' + str(cmd) + ' \n'
-    databytes = bytes(data,'utf-8')
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
-    
-
-def RPC_1arg(name, cmd, val1):
-    global pc
+    return session.send(bytes(data,'utf-8'), _lines(lines))
+
+
+def RPC_1arg(name, cmd, val1, lines=None):
     data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) + ' \n')
-    databytes = bytes(data,'utf-8')
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
-    
-
-def RPC_2arg(name, cmd, val1, val2):
-    global pc
-    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) + 
+    return session.send(bytes(data,'utf-8'), _lines(lines))
+
+
+def RPC_2arg(name, cmd, val1, val2, lines=None):
+    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) +
             ' ' + str(val2) +' \n')
-    databytes = bytes(data,'utf-8')
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
+    return session.send(bytes(data,'utf-8'), _lines(lines))
 
 
-def RPC_3arg(name, cmd, val1, val2, val3):
-    global pc
-    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) + 
+def RPC_3arg(name, cmd, val1, val2, val3, lines=None):
+    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) +
             ' ' + str(val2) + ' ' + str(val3) +' \n')
-    databytes = bytes(data,'utf-8')
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
+    return session.send(bytes(data,'utf-8'), _lines(lines))
 
 
-def RPC_4arg(name, cmd, val1, val2, val3, val4):
-    global pc
-    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) + 
+def RPC_4arg(name, cmd, val1, val2, val3, val4, lines=None):
+    data = ('/' + str(name) + '/' + str(cmd) + ' ' + str(val1) +
             ' ' + str(val2) + ' ' + str(val3) + ' ' + str(val4) +' \n')
-    databytes = bytes(data,'utf-8')
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
+    return session.send(bytes(data,'utf-8'), _lines(lines))
+
+### Send several commands back-to-back and return their replies in order
+### window: max number of commands sent but not yet answered
+def RPC_batch(commands, window=4):
+    """
+    Pipeline a list of commands, e.g. ["/DigitalOut_1/write 1", ["I2C_scan", "run"]].
+    Each command is expected to answer with one line, replies are returned as a list of RPCReply.
+    """
+    return session.batch(commands, window)
 
 ###Clear RPC and ready it for new input
-def RPC_newline():
-    global pc
-    databytes = b'\n'
-    pc.write(databytes)
-    reply = str(pc.readlines())
-    return(reply)
+def RPC_newline(lines=0):
+    return session.send(b'\n', int(lines))
 
 
 ###Read Lines from Serial port
 def RPC_readlines():
-    global pc
-    reply = str(pc.read(2048))
-    return(reply)
+    return session.readlines()
 
 ### Deinitialise port
 def RPC_close():
-    pc.close()
-    return "Port Closed"
\ No newline at end of file
+    session.close()
+    return "Port Closed"
+
+
+### Change the baud rate of the default session, negotiated with the target unless negotiate is False
+def RPC_setbaudrate(baudrate, negotiate=True):
+    if session.set_baudrate(baudrate, negotiate):
+        return ("Baudrate set: ", int(baudrate))
+    return ("Baudrate unchanged: ", session.pc.baudrate)
+
+### Switch the default session to binary framing, falls back to ASCII if the target does not support it
+def RPC_binary():
+    if session.enable_binary():
+        return "Binary framing"
+    return "ASCII framing"
+
+### Multi-board functions, boards are addressed by their serial port name
+def RPC_open(serial_port, baudrate=None):
+    """
+    Open a session to the board on serial_port, see get_session()
+    """
+    get_session(serial_port, baudrate)
+    return("Initialized " + str(serial_port))
+
+def RPC_call(serial_port, name, cmd, *args, lines=None):
+    """
+    Call an RPC function on the board on serial_port, e.g. RPC_call COM4 I2C_scan run
+    """
+    return get_session(serial_port).call(name, cmd, *args, lines=_lines(lines))
+
+def RPC_port_batch(serial_port, commands, window=4):
+    """
+    RPC_batch on the board on serial_port
+    """
+    return get_session(serial_port).batch(commands, window)
+
+def RPC_port_close(serial_port):
+    """
+    Close the session of serial_port
+    """
+    with _sessions_lock:
+        s = sessions.pop(serial_port, None)
+    if s is not None:
+        s.close()
+    return "Port Closed"
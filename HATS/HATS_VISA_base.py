@@ -1,16 +1,28 @@
 # -*- coding: utf-8 -*-
 import pyvisa as visa
 from pyvisa.constants import *
+import asyncio
+import functools
 import time
 import re
 import io
 import struct
 from decimal import Decimal
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+import ipaddress
+import socket
 
 
 ###Variables
 rm = None
+POOL_IDLE = 8 #Idle sessions kept open for reuse
+DISCOVERY_TTL = 60 #Seconds a resource scan is reused
+PROBE_TIMEOUT = 0.5 #Seconds per TCPIP host probe
+PROBE_PORTS = (111, 5025, 5555) #VXI-11 portmapper, SCPI raw socket, Rigol raw socket
+IDENTIFY_PREFIXES = ("TCPIP", "USB") #Resources queried with *IDN? by discovery
 
 
 #Initialise VISA with pyvisa-py resource manager
@@ -19,17 +31,18 @@ def VISA_init():
     Initiate PyVISA-py backend as resource manager.
     """
     global rm
-    rm = visa.ResourceManager('@py')
+    if rm is None:
+        rm = visa.ResourceManager('@py')
     return(rm)
 
 
 #Scan for available resources
-def scan_resource():
+def scan_resource(refresh=False):
     """
-    Scan and return all available ports. Not all port type will be listed. Eg. available TCPIP type ports will not be listed
+    Scan and return all available ports, cached for DISCOVERY_TTL seconds. Not all port type will be listed. Eg. available TCPIP type ports will not be listed,
+    unless hosts are given to discovery.configure()
     """
-    global rm
-    return(rm.list_resources())
+    return discovery.scan(refresh)
 
 
 #List out all opened resources
@@ -46,22 +59,365 @@ def VISA_deinit():
     Deinitialise PyVISA-py backend as resource manager.
     """
     global rm
-    rm.close()
+    discovery.stop()
+    pool.close_all()
+    if rm is not None:
+        rm.close()
+        rm = None
     return ("Resource closed")
 
 
+#Pool of open sessions keyed by resource string, shared across instruments and test suites
+class ResourcePool():
+    def __init__(self, idle=POOL_IDLE):
+        """
+        Reuse open sessions instead of a new TCPIP/VXI-11 handshake for every instrument.
+        A released session stays open until more than idle sessions are released (least recently used is closed),
+        close() or close_all(). A reused session is health-checked with *IDN? and reopened if it does not answer.
+        """
+        self.idle = idle
+        self.sessions = OrderedDict() # resource string --> [session, users]
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _healthy(session):
+        try:
+            session.query('*IDN?')
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(session):
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def acquire(self, port):
+        """
+        Return an open session of port, reused if possible.
+        """
+        port = str(port)
+        with self.lock:
+            entry = self.sessions.get(port)
+            if entry is not None and not self._healthy(entry[0]):
+                self._close(entry[0])
+                del self.sessions[port]
+                entry = None
+            if entry is None:
+                entry = [VISA_init().open_resource(port), 0]
+                self.sessions[port] = entry
+            entry[1] += 1
+            self.sessions.move_to_end(port)
+            return entry[0]
+
+    def release(self, port, close=False):
+        """
+        Return a session to the pool, idle sessions beyond the limit are closed.
+        close: also close the session if no other instrument uses it
+        """
+        port = str(port)
+        with self.lock:
+            if port in self.sessions:
+                self.sessions[port][1] = max(0, self.sessions[port][1] - 1)
+                self.sessions.move_to_end(port)
+                if close and self.sessions[port][1] == 0:
+                    self.close(port)
+            idle = [p for p, entry in self.sessions.items() if entry[1] == 0]
+            for p in idle[:max(0, len(idle) - self.idle)]:
+                self.close(p)
+
+    def close(self, port):
+        """
+        Close the session of port, whether or not it is in use.
+        """
+        with self.lock:
+            entry = self.sessions.pop(str(port), None)
+            if entry is not None:
+                self._close(entry[0])
+
+    def close_all(self):
+        with self.lock:
+            for port in list(self.sessions):
+                self.close(port)
+
+    def status(self):
+        """
+        Return {resource string: number of users} of the pooled sessions.
+        """
+        with self.lock:
+            return {port: entry[1] for port, entry in self.sessions.items()}
+
+pool = ResourcePool()
+
+
+#Cached resource discovery, list_resources() probes every backend and can take seconds
+class Discovery():
+    def __init__(self, ttl=DISCOVERY_TTL, hosts=(), timeout=PROBE_TIMEOUT, workers=32, identify=()):
+        """
+        ttl: seconds a scan is reused, a stale scan is returned while a refresh runs in the background
+        hosts: TCPIP hosts or subnets (eg. '192.168.1.0/24') probed in parallel
+        timeout: seconds per host probe and *IDN? query
+        identify: other resources (eg. serial SCPI instruments) to query *IDN? on, besides TCPIP/USB ones
+        """
+        self.lock = threading.Lock()
+        self.resources = None
+        self.identities = dict() # resource string --> *IDN? reply
+        self.stamp = 0
+        self._refreshing = None
+        self._timer = None
+        self._stopped = True
+        self.configure(ttl, hosts, timeout, workers, identify)
+
+    def configure(self, ttl=DISCOVERY_TTL, hosts=(), timeout=PROBE_TIMEOUT, workers=32, identify=()):
+        if isinstance(hosts, str):
+            hosts = hosts.split(',') if hosts else []
+        if isinstance(identify, str):
+            identify = identify.split(',') if identify else []
+        self.ttl = float(ttl)
+        self.hosts = [str(h).strip() for h in hosts]
+        self.timeout = float(timeout)
+        self.workers = int(workers)
+        self.identify_also = frozenset(str(r).strip() for r in identify)
+        self.stamp = 0
+
+    def _addresses(self):
+        addresses = []
+        for host in self.hosts:
+            if '/' in host:
+                addresses += [str(ip) for ip in ipaddress.ip_network(host, strict=False).hosts()]
+            else:
+                addresses.append(host)
+        return addresses
+
+    def _reachable(self, host):
+        for port in PROBE_PORTS:
+            try:
+                socket.create_connection((host, port), self.timeout).close()
+                return True
+            except OSError:
+                pass
+        return False
+
+    def _identifiable(self, resource):
+        # *IDN? would corrupt non-SCPI serial protocols (eg. Mbed RPC boards), serial ports are opt-in
+        return resource.startswith(IDENTIFY_PREFIXES) or resource in self.identify_also
+
+    def _identify(self, manager, resource):
+        # Idle pooled sessions are queried as they are, others are opened only for the query.
+        # A checked-out session does its I/O outside pool.lock, it keeps the identity already known.
+        if not self._identifiable(resource):
+            return None
+        try:
+            with pool.lock:
+                entry = pool.sessions.get(resource)
+                if entry is not None:
+                    if entry[1] or resource in self.identities:
+                        return self.identities.get(resource)
+                    return str(entry[0].query('*IDN?')).strip()
+            timeout = int(self.timeout * 1000)
+            session = manager.open_resource(resource, open_timeout=timeout, timeout=timeout)
+            try:
+                return str(session.query('*IDN?')).strip()
+            finally:
+                session.close()
+        except Exception:
+            return None
+
+    def refresh(self, identify=False, init=True):
+        """
+        Scan now: list_resources() and the TCPIP hosts in parallel, optionally *IDN? of TCPIP/USB resources.
+        init: initialise the resource manager if needed, otherwise (background refreshes) skip the scan without one
+        """
+        manager = VISA_init() if init else rm
+        if manager is None:
+            return self.resources
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            addresses = self._addresses()
+            listed = executor.submit(manager.list_resources)
+            reachable = list(executor.map(self._reachable, addresses))
+            resources = list(listed.result())
+            resources += ['TCPIP::' + a + '::INSTR' for a, ok in zip(addresses, reachable) if ok and 'TCPIP::' + a + '::INSTR' not in resources]
+            identities = dict(zip(resources, executor.map(functools.partial(self._identify, manager), resources))) if identify else self.identities
+        with self.lock:
+            self.resources = tuple(resources)
+            self.identities = {r: i for r, i in identities.items() if r in resources}
+            self.stamp = time.monotonic()
+            return self.resources
+
+    def _background(self, identify=False):
+        # Start one background refresh
+        with self.lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self.refresh, args=(identify, False), daemon=True)
+            self._refreshing.start()
+
+    def scan(self, refresh=False):
+        """
+        Return the cached resources, scan if there are none or refresh is set
+        """
+        if refresh or self.resources is None:
+            return self.refresh()
+        if time.monotonic() - self.stamp > self.ttl:
+            self._background()
+        return self.resources
+
+    def identify(self, refresh=False):
+        """
+        Return {resource: *IDN? reply or None}, queried in parallel.
+        Only TCPIP/USB resources and the configured identify list are queried, others are None.
+        """
+        if refresh or self.resources is None or len(self.identities) != len(self.resources):
+            self.refresh(identify=True)
+        return dict(self.identities)
+
+    def start(self, interval=None):
+        """
+        Refresh every interval seconds (default ttl) in the background, until stop()
+        """
+        interval = self.ttl if interval is None else float(interval)
+        def run():
+            self.refresh(bool(self.identities), init=False)
+            with self.lock:
+                if self._stopped:
+                    return
+                self._timer = threading.Timer(interval, run)
+                self._timer.daemon = True
+                self._timer.start()
+        self.stop()
+        with self.lock:
+            self._stopped = False
+            self._timer = threading.Timer(0, run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self):
+        with self.lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+discovery = Discovery()
+
+
+#Client-side cache of instrument settings, wraps a session
+class SCPICache():
+    # Commands without arguments that do not change settings
+    KEEP = frozenset(["RUN", "STOP", "TFOR", "CLE", "*CLS", "*TRG", "*WAI", "*OPC"])
+    # Commands without arguments that change the settings of a subtree --> its header prefix (single trigger sets TRIG:SWE)
+    INVALIDATE = {"SING": "TRIG:"}
+    # Commands that restore/change many settings at once
+    CLEAR = frozenset(["*RST", "AUT", "*RCL", "SYST:AUT", "SYST:SET"])
+
+    def __init__(self, session, cacheable=(), volatile=(), subtrees=()):
+        """
+        Answer repeated setting queries locally. Only queries starting with a cacheable header (short form, eg. 'TRIG:')
+        and not with a volatile one (eg. 'TRIG:STAT') are cached. A write stores keyword values (eg. EDGE, POS) sent by HATS and invalidates numeric ones,
+        as the instrument may round them. A write under a subtree (regex of a header prefix, eg. 'CHAN[0-9]:') invalidates
+        every cached query of that subtree, for settings that depend on each other (eg. range/probe --> scale/offset).
+        :SING invalidates the trigger settings. *RST, autoscale and unknown commands without arguments clear the cache. Call clear() after changes made at the front panel.
+        """
+        self.__dict__['_session'] = session
+        self.__dict__['_cacheable'] = tuple(cacheable)
+        self.__dict__['_volatile'] = tuple(volatile)
+        self.__dict__['_subtrees'] = [re.compile(subtree) for subtree in subtrees]
+        self.__dict__['values'] = dict() # normalized query --> reply
+        self.__dict__['hits'] = 0
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._session, name, value)
+
+    @staticmethod
+    def _node(node):
+        # Short form of a mnemonic: its upper case part, eg. TIMebase --> TIM
+        short = ''
+        for c in node:
+            if c.islower():
+                break
+            short += c
+        return short.upper()
+
+    def _split(self, command):
+        command = command.strip()
+        header, _, args = command.partition(' ')
+        query = '?' if header.endswith('?') else ''
+        header = ':'.join(self._node(n) for n in header.lstrip(':').rstrip('?').split(':'))
+        return header + query, args.strip()
+
+    def clear(self):
+        self.values.clear()
+
+    def _is_cacheable(self, header):
+        return header.startswith(self._cacheable) and not header.startswith(self._volatile)
+
+    def query(self, command, *args, **kwargs):
+        header, arg = self._split(command)
+        key = header + ' ' + arg if arg else header
+        if not self._is_cacheable(header) or args or kwargs:
+            return self._session.query(command, *args, **kwargs)
+        if key in self.values:
+            self.__dict__['hits'] += 1
+            return self.values[key]
+        reply = self._session.query(command)
+        self.values[key] = reply
+        return reply
+
+    def write(self, command, *args, **kwargs):
+        result = self._session.write(command, *args, **kwargs)
+        header, arg = self._split(command)
+        if header in self.CLEAR or (not arg and header not in self.KEEP and header not in self.INVALIDATE):
+            self.clear()
+            return result
+        query = header + '?'
+        prefixes = [m.group(0) for m in (subtree.match(header) for subtree in self._subtrees) if m]
+        if header in self.INVALIDATE:
+            prefixes.append(self.INVALIDATE[header])
+        for key in [k for k in self.values if k == query or k.startswith(query + ' ') or k.startswith(tuple(prefixes))]:
+            del self.values[key]
+        if arg and re.fullmatch('[A-Z][A-Z0-9]*', arg) and arg not in ('ON', 'OFF') and self._is_cacheable(query):
+            self.values[query] = arg + '\n'
+        return result
+
+
 #General VISA instrument class, the base for instrument-based subclasses
 class VISAinst():
     def __init__(self,port):
         self.port = port
-        self.open = rm.open_resource(str(port))
-    
+        self.open = pool.acquire(port)
+        self._pooled = True
+        self._executor = None
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
     def deinit(self):
         """
         De-initialise port connection with VISA resource manager.
+        The connection is closed unless other instruments still use it.
         """
-        self.open.close()
+        if self._pooled:
+            self._pooled = False
+            pool.release(self.port, close=True)
+        self._shutdown()
         return (str(self.port) + " deinitialized")
+
+    def release(self):
+        """
+        Return the port connection to the pool, it is reused by the next instrument on the same port.
+        """
+        if self._pooled:
+            self._pooled = False
+            pool.release(self.port)
+        self._shutdown()
+        return (str(self.port) + " released")
     
     
     #List down port related settings, useful for RS-232 connectivity
@@ -185,6 +541,38 @@ class VISAinst():
         return str(reply)
     
     
+### asyncio counterparts, every instrument runs its I/O on its own worker thread,
+### so independent instruments proceed concurrently in one event loop
+    async def arun(self, func_name, *args):
+        """
+        Run any method of the instrument without blocking the event loop,
+        e.g. await scope.arun('get_waveform_samples', 1)
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_running_loop()
+        func = functools.partial(getattr(self, func_name), *args)
+        return await loop.run_in_executor(self._executor, func)
+
+    async def aquery(self, input_query):
+        """
+        asyncio counterpart of query()
+        """
+        return await self.arun('query', input_query)
+
+    async def aread(self):
+        """
+        asyncio counterpart of read()
+        """
+        return await self.arun('read')
+
+    async def awrite(self, input_w):
+        """
+        asyncio counterpart of write()
+        """
+        return await self.arun('write', input_w)
+
+
 ### General Methods for SCPI commands common in all instruments
     def getid(self):
         """
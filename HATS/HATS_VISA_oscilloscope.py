@@ -3,11 +3,57 @@ import HATS_VISA_base as hv_base
 import time
 import re
 import io
-import struct
+import numpy as np
 from decimal import Decimal
 from PIL import Image
 
 
+###Variables
+WAVEFORM_WIDTH = {"BYTE": 1, "WORD": 2} #Bytes per point
+WAVEFORM_CHUNK = {"BYTE": 250000, "WORD": 125000} #Max points per :WAV:DATA? in RAW mode
+WAVEFORM_DTYPE = {0: np.dtype("u1"), 1: np.dtype("<u2")} #Preamble format (0 BYTE, 1 WORD) --> data type
+CACHEABLE = ("TRIG:", "CHAN", "TIM:", "WAV:SOUR", "WAV:MODE", "WAV:FORM", "WAV:STAR", "WAV:STOP",
+             "ACQ:TYPE", "ACQ:AVER", "ACQ:MDEP", "MEAS:SOUR") #Settings answered by the SCPI cache
+VOLATILE = ("TRIG:STAT", "TRIG:POS") #Never cached
+SUBTREES = ("CHAN[0-9]:", "TIM:", "TRIG:[A-Z0-9]+:") #A write invalidates every cached setting of its subtree
+MEASUREMENT_TYPES = frozenset(["MAX", "MIN", "CURR", "AVER", "DEV"])
+MEASUREMENT_ITEMS = frozenset([
+    "VMAX",
+    "VMIN",
+    "VPP",
+    "VTOP",
+    "VBAS",
+    "VAMP",
+    "VAVG",
+    "VRMS",
+    "OVER",
+    "PRES",
+    "MAR",
+    "MPAR",
+    "PER",
+    "FREQ",
+    "RTIM",
+    "FTIM",
+    "PWID",
+    "NWID",
+    "PDUT",
+    "NDUT",
+    "RDEL",
+    "FDEL",
+    "RPH",
+    "FPH",
+    "TVMAX",
+    "TVMIN",
+    "PSLEW",
+    "NSLEW",
+    "VUP",
+    "VMID",
+    "VLOW",
+    "VARI",
+    "PVRMS"
+])
+
+
 ###Sub-class for oscilloscope instrument (RIGOL-DS1054Z)
 # A good part of this class is adapted and inspired from https://github.com/nathankjer/instruments
 class oscilloscope(hv_base.VISAinst):
@@ -80,6 +126,29 @@ class oscilloscope(hv_base.VISAinst):
         else:
             return number
         
+###SCPI state cache
+    def enable_cache(self):
+        """
+        Answer repeated setting queries (trigger, channel, timebase, waveform setup) locally
+        instead of over the wire, see HATS_VISA_base.SCPICache.
+        """
+        if not isinstance(self.open, hv_base.SCPICache):
+            self.open = hv_base.SCPICache(self.open, CACHEABLE, VOLATILE, SUBTREES)
+        return ("Cache enabled")
+
+    def disable_cache(self):
+        if isinstance(self.open, hv_base.SCPICache):
+            self.open = self.open._session
+        return ("Cache disabled")
+
+    def sync(self):
+        """
+        Forget cached settings, eg. after changes at the front panel.
+        """
+        if isinstance(self.open, hv_base.SCPICache):
+            self.open.clear()
+        return ("Synchronised")
+
 ###Oscilloscope methods
     def autoscale(self):
         """
@@ -2504,87 +2573,45 @@ class oscilloscope(hv_base.VISAinst):
         source.
         """
         channel = self._interpret_channel(channel)
-        assert type in ["MAX", "MIN", "CURR", "AVER", "DEV"]
-        assert item in [
-            "VMAX",
-            "VMIN",
-            "VPP",
-            "VTOP",
-            "VBAS",
-            "VAMP",
-            "VAVG",
-            "VRMS",
-            "OVER",
-            "PRES",
-            "MAR",
-            "MPAR",
-            "PER",
-            "FREQ",
-            "RTIM",
-            "FTIM",
-            "PWID",
-            "NWID",
-            "PDUT",
-            "NDUT",
-            "RDEL",
-            "FDEL",
-            "RPH",
-            "FPH",
-            "TVMAX",
-            "TVMIN",
-            "PSLEW",
-            "NSLEW",
-            "VUP",
-            "VMID",
-            "VLOW",
-            "VARI",
-            "PVRMS"
-        ]
+        assert type in MEASUREMENT_TYPES
+        assert item in MEASUREMENT_ITEMS
         return self._masked_float(
             self.open.query(":MEAS:STAT:ITEM? {0},{1},{2}".format(type, item, channel))
         )
 
+    def get_measurements(self, items, type="CURR", channel=1):
+        """
+        Query the statistic results of several waveform parameters in one message.
+        items: list of item names (measured with type and channel) and/or (item, type, channel) tuples or lists,
+        or a comma separated string eg. "VMAX,VMIN,FREQ".
+        Returns {item or (item, type, channel) tuple: value}, None for values the oscilloscope cannot measure.
+        """
+        if isinstance(items, str):
+            items = items.split(",")
+        queries = []
+        for entry in items:
+            if isinstance(entry, str):
+                entry = entry.strip()
+                query = (entry, type, self._interpret_channel(channel))
+            else:
+                entry = tuple(entry)
+                query = (entry[0], entry[1], self._interpret_channel(entry[2]))
+            assert query[0] in MEASUREMENT_ITEMS
+            assert query[1] in MEASUREMENT_TYPES
+            queries.append((entry, query))
+        reply = self.open.query(";".join(
+            ":MEAS:STAT:ITEM? {1},{0},{2}".format(*query) for entry, query in queries))
+        values = reply.strip().split(";")
+        assert len(values) == len(queries)
+        return {entry: self._masked_float(value) for (entry, query), value in zip(queries, values)}
+
     def show_measurement(self, item, channel=1):
         """
         Set the statistic result of any waveform parameter of the specified
         source.
         """
         channel = self._interpret_channel(channel)
-        assert item in [
-            "VMAX",
-            "VMIN",
-            "VPP",
-            "VTOP",
-            "VBAS",
-            "VAMP",
-            "VAVG",
-            "VRMS",
-            "OVER",
-            "PRES",
-            "MAR",
-            "MPAR",
-            "PER",
-            "FREQ",
-            "RTIM",
-            "FTIM",
-            "PWID",
-            "NWID",
-            "PDUT",
-            "NDUT",
-            "RDEL",
-            "FDEL",
-            "RPH",
-            "FPH",
-            "TVMAX",
-            "TVMIN",
-            "PSLEW",
-            "NSLEW",
-            "VUP",
-            "VMID",
-            "VLOW",
-            "VARI",
-            "PVRMS"
-        ]
+        assert item in MEASUREMENT_ITEMS
         self.open.write(":MEAS:STAT:ITEM {0},{1}".format(item, channel))
 
     def reference_is_shown(self):
@@ -2970,7 +2997,8 @@ class oscilloscope(hv_base.VISAinst):
         return self.open.query(":TRIGger:STATus?")
     
     def is_running(self):
-        return any(i in self.get_trigger_status() for i in ["TD", "WAIT", "RUN", "AUTO"])
+        status = self.get_trigger_status()
+        return any(i in status for i in ["TD", "WAIT", "RUN", "AUTO"])
 
     def force_trigger(self):
         """
@@ -3443,13 +3471,69 @@ class oscilloscope(hv_base.VISAinst):
             y_reference,
         )
 
-    def get_waveform_samples(self, channel=1):
+    def _strip_tmc_header(self, tmp_buff):
         """
-        Adapted from https://github.com/pklaus/ds1054z
+        Return the data block of a TMC response (#NXXXXXXXXX<data>), without copying it
         """
+        n_header_bytes = int(chr(tmp_buff[1])) + 2
+        n_data_bytes = int(tmp_buff[2:n_header_bytes].decode("ascii"))
+        return memoryview(tmp_buff)[n_header_bytes : n_header_bytes + n_data_bytes]
+
+    def _read_waveform(self, points, format="BYTE", progress=None, window=None):
+        """
+        Read points of the current waveform source in chunks into one preallocated bytearray.
+        window: [start, stop] last written, start/stop writes that would not change it are skipped
+        """
+        width = WAVEFORM_WIDTH[format]
+        chunk = WAVEFORM_CHUNK[format]
+        window = [None, None] if window is None else window
+        buffer = bytearray(points * width)
+        start_time = time.perf_counter()
+        self.transfer_rate = 0.0
+        for start in range(1, points + 1, chunk):
+            stop = min(start + chunk - 1, points)
+            if window[0] != start:
+                self.set_waveform_start(start)
+                window[0] = start
+            if window[1] != stop:
+                self.set_waveform_stop(stop)
+                window[1] = stop
+            data = self._strip_tmc_header(self.get_waveform_data())
+            assert len(data) == (stop - start + 1) * width
+            buffer[(start - 1) * width : stop * width] = data
+            self.transfer_rate = stop * width / (time.perf_counter() - start_time)
+            if progress is not None:
+                progress(stop, points, self.transfer_rate)
+        return buffer
+
+    def download_waveform_memory(self, channel=1, format="BYTE", progress=None):
+        """
+        Download the whole record of a channel from internal memory (RAW mode, up to 24 Mpts),
+        in chunks of WAVEFORM_CHUNK points into one preallocated bytearray.
+        The oscilloscope is stopped first, as RAW mode requires.
+        progress: None, a function called with (points read, points, bytes/s) after every chunk,
+        or True to print it. Returns the preamble and the raw bytes (WAVEFORM_WIDTH bytes per point),
+        the transfer rate is kept in self.transfer_rate (bytes/s).
+        """
+        assert format in WAVEFORM_CHUNK
+        if progress is True:
+            progress = lambda done, points, rate: print(
+                "{0}/{1} points, {2:.0f} bytes/s".format(done, points, rate))
+        if self.is_running():
+            self.stop()
         channel = self._interpret_channel(channel)
         self.set_waveform_source(channel)
-        self.set_waveform_format("BYTE")
+        self.set_waveform_mode("RAW")
+        self.set_waveform_format(format)
+        preamble = self.get_waveform_preamble()
+        buffer = self._read_waveform(preamble[2], format, progress)
+        return preamble, buffer
+
+    def _scale_waveform(self, preamble, buff):
+        """
+        Convert raw waveform bytes to (time axis, volts) NumPy arrays using the preamble.
+        The codes are read in place from buff, the volts are computed in one vectorized pass.
+        """
         (
             format,
             type,
@@ -3461,22 +3545,84 @@ class oscilloscope(hv_base.VISAinst):
             y_increment,
             y_origin,
             y_reference,
-        ) = self.get_waveform_preamble()
+        ) = preamble
+        codes = np.frombuffer(buff, dtype=WAVEFORM_DTYPE[format])
+        samples = np.subtract(codes, y_origin + y_reference, dtype=np.float64)
+        samples *= y_increment
+        x_axis = np.arange(len(codes), dtype=np.float64)
+        x_axis *= x_increment
+        x_axis += x_origin - x_reference * x_increment
+        return x_axis, samples
+
+    def get_waveform_memory_samples(self, channel=1, format="BYTE", progress=None):
+        """
+        Download the whole record of a channel, see download_waveform_memory().
+        Returns the time axis and volts as NumPy arrays.
+        """
+        preamble, buff = self.download_waveform_memory(channel, format, progress)
+        return self._scale_waveform(preamble, buff)
+
+    def single_acquisition(self, timeout=10, arm_window=0.5):
+        """
+        Arm a single trigger and wait until the acquisition is complete (stopped).
+        Raises TimeoutError if the oscilloscope is not stopped within timeout s.
+        """
+        self.open.write(":SING")
+        self.open.query("*OPC?")
+        start = time.perf_counter()
+        # A stopped oscilloscope can still report STOP before it re-arms, give it arm_window s to leave STOP.
+        # A fast trigger can arm, trigger and stop again before the first poll, so STOP after that is taken as done.
+        while "STOP" in self.get_trigger_status() and time.perf_counter() - start < arm_window:
+            time.sleep(0.01)
+        while "STOP" not in self.get_trigger_status():
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("No trigger within {0} s".format(timeout))
+            time.sleep(0.01)
+
+    def capture_channels(self, channels=(1, 2, 3, 4), memory=False, single=False, format="BYTE", timeout=10):
+        """
+        Download several channels from the same acquisition, for correct inter-channel timing.
+        The oscilloscope is stopped (or single-triggered with single=True) once and left stopped.
+        Hidden channels are skipped; memory=True reads the whole record (RAW) instead of the screen.
+        Returns the time axis and the list of channels read, and volts as a NumPy array (one row per channel).
+        """
+        if single:
+            self.single_acquisition(timeout)
+        elif self.is_running():
+            self.stop()
+        channels = [self._interpret_channel(c) for c in channels]
+        channels = [c for c in channels if self.channel_is_shown(c)]
+        assert channels, "No channel shown"
+        if not memory:
+            format = "BYTE"
+        self.set_waveform_mode("RAW" if memory else "NORM")
+        self.set_waveform_format(format)
+        window = [None, None]
+        x_axis, samples = None, None
+        for i, channel in enumerate(channels):
+            self.set_waveform_source(channel)
+            preamble = self.get_waveform_preamble()
+            buff = self._read_waveform(preamble[2], format, window=window)
+            if samples is None:
+                x_axis, volts = self._scale_waveform(preamble, buff)
+                samples = np.empty((len(channels), len(volts)))
+            else:
+                volts = self._scale_waveform(preamble, buff)[1]
+            samples[i] = volts
+        return x_axis, channels, samples
+
+    def get_waveform_samples(self, channel=1):
+        """
+        Adapted from https://github.com/pklaus/ds1054z
+        """
+        channel = self._interpret_channel(channel)
+        self.set_waveform_source(channel)
+        self.set_waveform_mode("NORM")
+        self.set_waveform_format("BYTE")
+        preamble = self.get_waveform_preamble()
+        points = preamble[2]
         self.set_waveform_start(1)
         self.set_waveform_stop(1200)
-        tmp_buff = self.get_waveform_data()
-        n_header_bytes = int(chr(tmp_buff[1])) + 2
-        n_data_bytes = int(tmp_buff[2:n_header_bytes].decode("ascii"))
-        buff = tmp_buff[n_header_bytes : n_header_bytes + n_data_bytes]
+        buff = self._strip_tmc_header(self.get_waveform_data())
         assert len(buff) == points
-        samples = list(struct.unpack(str(len(buff)) + "B", buff))
-        samples = [
-            (sample - y_origin - y_reference) * y_increment for sample in samples
-        ]
-        timebase_scale = self.get_timebase_scale()
-        timebase_offset = self.get_timebase_offset()
-        x_axis = [
-            i * timebase_scale / 10.0 + timebase_offset
-            for i in range(-len(samples) // 2, len(samples) // 2)
-        ]
-        return x_axis, samples
\ No newline at end of file
+        return self._scale_waveform(preamble, buff)
\ No newline at end of file
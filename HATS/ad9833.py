@@ -1,10 +1,11 @@
 #!/usr/bin/python3
 import time
 from ad9833_driver import AD9833
+from lazy import Lazy
 
 # device and spi_ch
 spi_ch = 0
-wave = AD9833(0, spi_ch)
+wave = Lazy(lambda: AD9833(0, spi_ch))
 
 # Input waveform and frequency
 def generate(shape = 'sine',freq = 1000):
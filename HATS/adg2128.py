@@ -1,11 +1,12 @@
 import gpio
 from adg2128_driver import ADG2128
+from lazy import Lazy
 
 I2C_ARRR_000 = 0x70
 I2C_ADDR_001 = 0x71
 
-adg2128_1 = ADG2128(I2C_ARRR_000)
-adg2128_2 = ADG2128(I2C_ADDR_001)
+adg2128_1 = Lazy(lambda: ADG2128(I2C_ARRR_000))
+adg2128_2 = Lazy(lambda: ADG2128(I2C_ADDR_001))
 
 
 def set_switch(device,control,x=0,y=0):
@@ -1,5 +1,6 @@
 import gpio
-from smbus2 import SMBus, i2c_msg
+from smbus2 import i2c_msg
+import i2c_bus
 
 I2C_ARRR_000 = 0x70
 I2C_ADDR_001 = 0x71
@@ -64,11 +65,11 @@ class ADG2128:
 
         :param i2c_addr: I2C address, defaults to I2C_ARRR_000
         :type i2c_addr: hex
-        :param i2c_dev: I2C Dev, defaults to None
-        :type i2c_dev: None
+        :param i2c_dev: Bus number or i2c_bus.I2CBus session, defaults to None (shared session of bus 1)
+        :type i2c_dev: int
         """
         self.i2c_addr = i2c_addr
-        self.i2c_dev = i2c_dev
+        self.i2c_dev = i2c_bus.get_bus(i2c_dev)
 
     def set_switch(self,control,x,y):
         """Set switch state\n
@@ -87,7 +88,7 @@ class ADG2128:
         msb = ((CONTROL[control] << 7) | X[x] << 3) | Y[y]
         lsb = 0x00 | NO_LATCH
         print([hex(msb),hex(lsb)])
-        with SMBus(1) as bus :
+        with self.i2c_dev as bus :
             msg = i2c_msg.write(self.i2c_addr,[msb,lsb])
             bus.i2c_rdwr(msg)
           
@@ -106,7 +107,7 @@ class ADG2128:
         :param list: Pairs of switches, defaults to []
         :type list: list
         """
-        with SMBus(1) as bus :
+        with self.i2c_dev as bus :
             for i  in range(0,len(list),2):
             
                 if i != len(list)-2:
@@ -132,7 +133,7 @@ class ADG2128:
         :return: 1 Byte of data
         :rtype: byte
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             msg = i2c_msg.write(self.i2c_addr, [RB[line],0x00])
             bus.i2c_rdwr(msg)
             data = bus.read_i2c_block_data(self.i2c_addr,0,2)
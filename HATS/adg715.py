@@ -1,8 +1,9 @@
 from adg715_driver import ADG715
+from lazy import Lazy
 
 I2C_ADDR_GND = 0x48
 
-adg715 = ADG715(I2C_ADDR_GND)
+adg715 = Lazy(lambda: ADG715(I2C_ADDR_GND))
 
 
 def set_relay(value=[]):
@@ -1,5 +1,6 @@
 import gpio
-from smbus2 import SMBus, i2c_msg
+from smbus2 import i2c_msg
+import i2c_bus
 
 I2C_ADDR_GND = 0x48
 
@@ -14,11 +15,11 @@ class ADG715:
 
         :param i2c_addr: I2C address, defaults to I2C_ADDR_GND
         :type i2c_addr: [type], optional
-        :param i2c_dev: I2C DEV, defaults to None
-        :type i2c_dev: [type], optional
+        :param i2c_dev: Bus number or i2c_bus.I2CBus session, defaults to None (shared session of bus 1)
+        :type i2c_dev: int, optional
         """
         self._i2c_addr = i2c_addr
-        self._i2c_dev = i2c_dev
+        self._i2c_dev = i2c_bus.get_bus(i2c_dev)
 
     def numToHex(self,arr):
         """ Convert numbers in array to hex
@@ -41,7 +42,7 @@ class ADG715:
             e.g If switch 2,5 is high = 00010010 = 0x12
         :type value: Byte
         """
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             # Write a single byte to address 80
             b = self.numToHex(value)
             msg = i2c_msg.write(I2C_ADDR_GND, [b])
@@ -54,7 +55,7 @@ class ADG715:
         :return: Returns the hex value representing switch states
         :rtype: Byte
         """
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             data = bus.read_byte(I2C_ADDR_GND)
             return data
         
@@ -1,4 +1,5 @@
 from ads1015_driver import ADS1015
+from lazy import Lazy
 import time
 
 
@@ -11,32 +12,26 @@ CHANNELS = ['in0/gnd','in1/gnd','in2/gnd','in3/gnd',
 'in0/in1','in0/in3','in1/in3','in2/in3']
 
 
-ads1015 = ADS1015(I2C_ADDRESS_ADDR_VDD)
+ads1015 = Lazy(lambda: ADS1015(I2C_ADDRESS_ADDR_VDD))
 
-def get_all_voltage(mode = "single",sample_rate=1600,gain=2.048):
+def get_all_voltage(mode = "single",sample_rate=1600,gain=2.048,channels=CHANNELS,repeat=1):
+    """Scan channels and return a structured array with fields channel, raw and voltage (channel x sample)
+    """
     # 'single'/'continuous' 
     ads1015.set_mode(mode)
     #one of 128, 250, 490, 920, 1600 (default), 2400 or 330
     ads1015.set_sample_rate(sample_rate)
     #one of 6.144, 4.096, 2.048 (default), 1.024, 0.512 or 0.256
     ads1015.set_gain(gain)
-    ##print(ads1015.get_conversion_value())
+    result = ads1015.scan(channels,repeat)
     print('Reading ADS1015 values.....')
     # Print nice channel column headers.
-    print('| {:>1} | {:>1} | {:>1} | {:>1} | {:>1} | {:>1} | {:>1} | {:>1} |'.format(
-    'in0/gnd','in1/gnd','in2/gnd','in3/gnd','in0/in1','in0/in3','in1/in3','in2/in3'))
+    print(' '.join('| {:^7}'.format(c) for c in result['channel']) + ' |')
     print('-' * 80)
-    # Main loop.
-    # Read all the ADC channel values in a list.
-    values = [0]*8
-    raw = [0]*8
-    for i in range(8):
-        ads1015.set_mux(CHANNELS[i])
-        values[i] = ads1015.get_voltage()
-        raw[i] = ads1015.get_raw_voltage()
-        
-    print('| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} | {5:^7} | {6:^7} | {7:^7} |'.format(*values))
-    print('| {0:^7} | {1:^7} | {2:^7} | {3:^7} | {4:^7} | {5:^7} | {6:^7} | {7:^7} |'.format(*raw))
+    # Last reading of each channel
+    print(' '.join('| {:^7.4f}'.format(v) for v in result['voltage'][:,-1]) + ' |')
+    print(' '.join('| {:^7}'.format(r) for r in result['raw'][:,-1]) + ' |')
+    return result
 
 def get_voltage(mode = "single",rate=1600,gain=2.048,channel="in0/gnd"):
     ads1015.set_sample_rate(rate)
@@ -47,6 +42,16 @@ def get_voltage(mode = "single",rate=1600,gain=2.048,channel="in0/gnd"):
     print("{} V".format(voltage))
     return voltage
 
+def stream_voltage(channel="in0/gnd",rate=3300,samples=1000):
+    # Continuous mode at the programmed data rate, returns the voltages
+    voltages = []
+    dropped = 0
+    for t, v, d in ads1015.stream(channel,rate,n=samples):
+        voltages.append(v)
+        dropped += d
+    print("{} samples, {} dropped".format(len(voltages),dropped))
+    return voltages
+
 def get_config():
     #print("Channel : {}".format(ads1015.get_mux()))
     print("Gain : {}".format(ads1015.get_gain()))
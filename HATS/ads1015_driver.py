@@ -1,5 +1,9 @@
-from smbus2 import SMBus, i2c_msg
-import struct
+from smbus2 import i2c_msg
+import codec
+import gpio
+import i2c_bus
+import numpy as np
+import threading
 import time
 
 
@@ -16,6 +20,8 @@ RATE_MASK = 0x7F1F
 MODE_MASK = 0x7EFF
 COMPARATOR_MODE_MASK = 0x7FEF
 COMPARATOR_POLARITY_MASK = 0x7FF7
+COMPARATOR_QUEUE_MASK = 0x7FFC
+OS_MASK = 0x7FFF
 
 ''' bit Shift '''
 MUX_SHIFT = 12
@@ -26,6 +32,12 @@ RATE_SHIFT = 5
 MODE_SHIFT = 8
 COMPARATOR_MODE_SHIFT = 4
 COMPARATOR_POLARITY_SHIFT = 3
+COMPARATOR_QUEUE_SHIFT = 0
+
+''' Conversion timing '''
+RATE_TOLERANCE = 1.1    # Data rate varies by up to 10%
+POLL_DIVIDER = 10       # OS bit is polled 10 times per conversion period
+TIMEOUT_PERIODS = 2     # Give up after 2 conversion periods
 
 ''' Keys '''
 MUX = { 'in0/in1': 0b000,   # Differential reading between in0 and in1, voltages must not be negative and must not exceed supply voltage
@@ -37,6 +49,12 @@ MUX = { 'in0/in1': 0b000,   # Differential reading between in0 and in1, voltages
         'in2/gnd': 0b110,   # Single-ended reading between in2 and GND
         'in3/gnd': 0b111}
 
+''' ALERT/RDY asserts after 1, 2 or 4 conversions beyond threshold, 'disable' turns the comparator off '''
+COMPARATOR_QUEUE = {1: 0b00,
+                    2: 0b01,
+                    4: 0b10,
+                    'disable': 0b11}
+
 GAIN = {6.144: 0b000,
         4.096: 0b001,
         2.048: 0b010,
@@ -61,13 +79,7 @@ def list_to_bits(list):
     :return: Stream of binary bits in hex form
     :rtype: hex
     """
-    shift = (len(list)-1)*8
-    data = 0x0000
-    for b in list:
-        b = b << shift
-        data = data | b
-        shift -= 8
-    return data
+    return codec.bytes_to_int(list)
 
 
 def hword_to_byte_list(hword):
@@ -79,12 +91,7 @@ def hword_to_byte_list(hword):
     :return: Byte list
     :rtype: list
     """
-    list = []
-    msb = (hword & 0xFF00) >> 8
-    lsb = hword & 0x00FF
-    list.append(msb)
-    list.append(lsb)
-    return list
+    return codec.int_to_bytes(hword, 2)
 
 def twos_comp(val, bits):
     """compute the 2's complement of int value val
@@ -96,9 +103,7 @@ def twos_comp(val, bits):
     :return: 2's complement of int value
     :rtype: int
     """
-    if (val & (1 << (bits - 1))) != 0: # if sign bit is set e.g., 8bit: 128-255
-        val = val - (1 << bits)        # compute negative value
-    return val
+    return codec.twos_comp(val, bits)
 
 class ADS1015:
     def __init__(self, i2c_addr, alert_pin=None, i2c_dev=None):
@@ -106,14 +111,70 @@ class ADS1015:
 
         :param i2c_addr: I2C address
         :type i2c_addr: 
-        :param alert_pin: defaults to None
-        :type alert_pin: 
-        :param i2c_dev: defaults to None
-        :type i2c_dev: 
+        :param alert_pin: BCM pin wired to ALERT/RDY, needed for enable_ready_pin(), defaults to None
+        :type alert_pin: int
+        :param i2c_dev: Bus number or i2c_bus.I2CBus session, defaults to None (shared session of bus 1)
+        :type i2c_dev: int
         """
         self.i2c_addr = i2c_addr
-        self.i2c_dev = i2c_dev
+        self.i2c_dev = i2c_bus.get_bus(i2c_dev)
         self.alert_pin = alert_pin
+        # Write-through copy of CONFIG (OS bit cleared), LO_THRESH and HI_THRESH
+        self._shadow = {}
+        # Set by the ALERT/RDY edge callback once enable_ready_pin() is called
+        self._ready = None
+
+    def _read_reg(self, reg):
+        """Get a 16 bit register from the shadow copy, read over I2C only on a miss
+
+        :param reg: Register, CONFIG_REG, LOW_THRESH_REG or HIGH_THRESH_REG
+        :type reg: int
+        :return: 16 bits value in int
+        :rtype: int
+        """
+        if reg not in self._shadow:
+            with self.i2c_dev as bus:
+                data = list_to_bits(bus.read_i2c_block_data(self.i2c_addr,reg,2))
+            self._shadow[reg] = data & OS_MASK if reg == CONFIG_REG else data
+        return self._shadow[reg]
+
+    def _write_reg(self, reg, value):
+        """Write a 16 bit register and update the shadow copy
+
+        :param reg: Register, CONFIG_REG, LOW_THRESH_REG or HIGH_THRESH_REG
+        :type reg: int
+        :param value: 16 bits value
+        :type value: int
+        """
+        with self.i2c_dev as bus:
+            bus.write_i2c_block_data(self.i2c_addr,reg,hword_to_byte_list(value))
+        self._shadow[reg] = value & OS_MASK if reg == CONFIG_REG else value
+
+    def _update_config(self, mask, bits):
+        """Read-modify-write a config field on the shadow copy, skips the write if nothing changes
+
+        :param mask: Field mask, e.g. MUX_MASK
+        :type mask: int
+        :param bits: New field bits, already shifted
+        :type bits: int
+        """
+        reg = self._read_reg(CONFIG_REG)
+        data = (reg & mask) | bits
+        if data != reg:
+            self._write_reg(CONFIG_REG, data)
+
+    def sync(self):
+        """Reload the shadow copy of CONFIG, LO_THRESH and HI_THRESH from the IC
+        """
+        self.invalidate()
+        for reg in (CONFIG_REG, LOW_THRESH_REG, HIGH_THRESH_REG):
+            self._read_reg(reg)
+
+    def invalidate(self):
+        """Drop the shadow copy, e.g. after the IC was reset or written by someone else\n
+        The next access reads the registers over I2C again
+        """
+        self._shadow.clear()
 
     
     def get_conversion_reg(self):
@@ -121,11 +182,14 @@ class ADS1015:
 
         :return: Returns 16 bits value in int
         :rtype: int
+        :raises TimeoutError: If the conversion did not finish within TIMEOUT_PERIODS conversion times
         """
+        if self._ready is not None:
+            self._ready.clear()
         self.start_conversion()
-        if not self.conversion_ready():
-            time.sleep(0.05)
-        with SMBus(1) as bus:
+        if not self.wait_conversion():
+            raise TimeoutError("ADS1015 0x{:02x}: conversion not ready after {} conversion times".format(self.i2c_addr, TIMEOUT_PERIODS))
+        with self.i2c_dev as bus:
             data = list_to_bits(bus.read_i2c_block_data(self.i2c_addr,CONVERSION_REG,2))
             return data
 
@@ -151,13 +215,36 @@ class ADS1015:
         return data*lsb
 
     
+    def scan(self, channels, repeat=1):
+        """Scan a list of channels, programming the mux once per channel and taking
+        repeat single-shot conversions per channel. Volts are computed in one pass.\n
+        e.g. scan(['in0/gnd','in1/gnd'], 4)['voltage'][1] = 4 readings of in1/gnd
+
+        :param channels: Mux settings, e.g. ['in0/gnd','in1/gnd']
+        :type channels: list
+        :param repeat: Conversions per channel, defaults to 1
+        :type repeat: int
+        :return: One record per channel with fields channel, raw (signed 12 bit codes) and voltage
+        :rtype: numpy structured array
+        """
+        codes = np.empty((len(channels), repeat), dtype=codec.DTYPE['u16'])
+        for i, channel in enumerate(channels):
+            self.set_mux(channel)
+            for j in range(repeat):
+                codes[i, j] = self.get_conversion_reg()
+        lsb = (self.get_gain()*2)/(2**12)
+        result = np.empty(len(channels), dtype=[('channel', 'U7'),
+                                                ('raw', np.int16, (repeat,)),
+                                                ('voltage', np.float64, (repeat,))])
+        result['channel'] = channels
+        result['raw'] = codec.decode(codes, 's16', CONVERSION_SHIFT).reshape(codes.shape)
+        result['voltage'] = result['raw'] * lsb
+        return result
+
     def start_conversion(self):
         """Starts a conversion
         """
-        data = 0x8000 | self.get_config_reg()
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._write_reg(CONFIG_REG, 0x8000 | self._read_reg(CONFIG_REG))
 
     def conversion_ready(self):
         """Check is the conversion ready
@@ -170,15 +257,82 @@ class ADS1015:
             return True
         return False
 
+    def conversion_time(self):
+        """Get the time of one conversion at the configured sample rate
+
+        :return: Conversion time in seconds
+        :rtype: float
+        """
+        return 1.0 / self.get_sample_rate()
+
+    def wait_conversion(self):
+        """Wait for the conversion started by start_conversion()\n
+        With enable_ready_pin() the ALERT/RDY edge is awaited, otherwise the OS bit
+        is polled after one conversion time. Either way the wait is bounded by
+        TIMEOUT_PERIODS conversion times.
+
+        :return: True if the conversion finished, False on timeout
+        :rtype: bool
+        """
+        period = self.conversion_time() * RATE_TOLERANCE
+        timeout = period * TIMEOUT_PERIODS
+        if self._ready is not None:
+            if self._ready.wait(timeout):
+                return True
+            return self.conversion_ready()
+        deadline = time.monotonic() + timeout
+        time.sleep(period / RATE_TOLERANCE)
+        while not self.conversion_ready():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(period / POLL_DIVIDER)
+        return True
+
+    def enable_ready_pin(self):
+        """Use the ALERT/RDY pin as conversion-ready signal\n
+        Sets Hi_thresh MSB to 1 and Lo_thresh MSB to 0 and enables the comparator queue,
+        so the pin pulses after every conversion. Waits on conversions then use the pin
+        edge instead of polling over I2C. Set the comparator polarity before calling this
+        and call it again after reset().
+
+        :raises ValueError: If no alert_pin was given
+        """
+        if self.alert_pin is None:
+            raise ValueError("alert_pin is needed to use the ALERT/RDY pin")
+        GPIO = gpio.backend()
+        self._write_reg(LOW_THRESH_REG, 0x0000)
+        self._write_reg(HIGH_THRESH_REG, 0x8000)
+        self._update_config(COMPARATOR_QUEUE_MASK, COMPARATOR_QUEUE[1] << COMPARATOR_QUEUE_SHIFT)
+        if self.get_comparator_polarity() == "Active High":
+            edge = GPIO.RISING
+        else:
+            edge = GPIO.FALLING
+        self._ready = threading.Event()
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.alert_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.remove_event_detect(self.alert_pin)
+        GPIO.add_event_detect(self.alert_pin, edge, callback=lambda pin: self._ready.set())
+
+    def disable_ready_pin(self):
+        """Stop using the ALERT/RDY pin and turn the comparator off again
+        """
+        GPIO = gpio.backend()
+        if self._ready is not None:
+            GPIO.remove_event_detect(self.alert_pin)
+            self._ready = None
+        self._update_config(COMPARATOR_QUEUE_MASK, COMPARATOR_QUEUE['disable'] << COMPARATOR_QUEUE_SHIFT)
+
     def get_config_reg(self):
-        """Get 16 bit configuration value from configuration register
+        """Get 16 bit configuration value from configuration register\n
+        Always reads the IC (the OS bit is live) and refreshes the shadow copy
 
         :return: Returns 16 bits value in int
         :rtype: int
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = list_to_bits(bus.read_i2c_block_data(self.i2c_addr,CONFIG_REG,2))
-            return data
+        self._shadow[CONFIG_REG] = data & OS_MASK
+        return data
 
     def set_mux(self,channel = "in0/gnd"):
         """Sets the internal mux to switch between channel\n
@@ -194,11 +348,7 @@ class ADS1015:
         :param channel: e.g 'in0/gnd' - Single-ended reading between in0 and GND,, defaults to "in0/gnd"
         :type channel: str
         """
-        reg = self.get_config_reg() & MUX_MASK
-        data = reg | (MUX[channel] << MUX_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(MUX_MASK, (MUX[channel] << MUX_SHIFT))
     
     
     def get_mux(self):
@@ -207,7 +357,7 @@ class ADS1015:
         :return: Mux state
         :rtype: str
         """
-        data = 0b111 & (self.get_config_reg() >> MUX_SHIFT)
+        data = 0b111 & (self._read_reg(CONFIG_REG) >> MUX_SHIFT)
         for key, value in MUX.items(): 
             if value == data:
                 return key
@@ -219,11 +369,7 @@ class ADS1015:
         :param gain: Gain, defaults to 2.048
         :type gain: float
         """
-        reg = self.get_config_reg() & GAIN_MASK
-        data = reg | (GAIN[gain] << GAIN_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(GAIN_MASK, (GAIN[gain] << GAIN_SHIFT))
     
     def get_gain(self):
         """Get current gain setting
@@ -231,7 +377,7 @@ class ADS1015:
         :return: Gain value
         :rtype: float
         """
-        data = 0b111 & (self.get_config_reg() >> GAIN_SHIFT)
+        data = 0b111 & (self._read_reg(CONFIG_REG) >> GAIN_SHIFT)
         for key, value in GAIN.items(): 
             if value == data:
                 return key
@@ -243,11 +389,7 @@ class ADS1015:
         :param rate: Sampling rate, defaults to 1600
         :type rate: int
         """
-        reg = self.get_config_reg() & RATE_MASK
-        data = reg | (RATE[rate] << RATE_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(RATE_MASK, (RATE[rate] << RATE_SHIFT))
 
     def get_sample_rate(self):
         """Get sampling rate
@@ -255,7 +397,7 @@ class ADS1015:
         :return: Current sampling rate
         :rtype: int
         """
-        data = 0b111 & (self.get_config_reg() >> RATE_SHIFT)
+        data = 0b111 & (self._read_reg(CONFIG_REG) >> RATE_SHIFT)
         for key, value in RATE.items(): 
             if value == data:
                 return key
@@ -275,11 +417,7 @@ class ADS1015:
             m = 1
         else:
             m = 0
-        reg = self.get_config_reg() & MODE_MASK
-        data = reg | (m << MODE_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(MODE_MASK, (m << MODE_SHIFT))
 
     def get_mode(self):
         """Get current operation mode
@@ -287,7 +425,7 @@ class ADS1015:
         :return: Operation mode
         :rtype: str
         """
-        data = 0b1 & (self.get_config_reg() >> MODE_SHIFT)
+        data = 0b1 & (self._read_reg(CONFIG_REG) >> MODE_SHIFT)
         if data == 1:
             return "single"
         return "continous"
@@ -308,11 +446,7 @@ class ADS1015:
             m = 1
         else:
             m = 0
-        reg = self.get_config_reg() & COMPARATOR_MODE_MASK
-        data = reg | (m << COMPARATOR_MODE_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(COMPARATOR_MODE_MASK, (m << COMPARATOR_MODE_SHIFT))
     
     def get_comparator_mode(self):
         """Get comparator mode
@@ -320,7 +454,7 @@ class ADS1015:
         :return: Comparator mode
         :rtype: str
         """
-        data = 0b1 & (self.get_config_reg() >> COMPARATOR_MODE_SHIFT)
+        data = 0b1 & (self._read_reg(CONFIG_REG) >> COMPARATOR_MODE_SHIFT)
         if data == 1:
             return "window"
         return "traditional"
@@ -339,11 +473,8 @@ class ADS1015:
         mask = 0x0000
         gain = self.get_gain()
         lsb = (gain*2)/(2**12)
-        l = hword_to_byte_list(mask | (int(low/lsb) << 4))
-        h = hword_to_byte_list(mask | (int(high/lsb) << 4))
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,LOW_THRESH_REG,l)
-            bus.write_i2c_block_data(self.i2c_addr,HIGH_THRESH_REG,h)
+        self._write_reg(LOW_THRESH_REG, (mask | (int(low/lsb) << 4)) & 0xFFFF)
+        self._write_reg(HIGH_THRESH_REG, (mask | (int(high/lsb) << 4)) & 0xFFFF)
 
     def get_threshold(self):
         """Get Low and High threshold values\n
@@ -354,9 +485,8 @@ class ADS1015:
         """
         gain = self.get_gain()
         lsb = (gain*2)/(2**12)
-        with SMBus(1) as bus:
-            low = list_to_bits(bus.read_i2c_block_data(self.i2c_addr,LOW_THRESH_REG,2)) >> 4
-            high = list_to_bits(bus.read_i2c_block_data(self.i2c_addr,HIGH_THRESH_REG,2)) >> 4
+        low = self._read_reg(LOW_THRESH_REG) >> 4
+        high = self._read_reg(HIGH_THRESH_REG) >> 4
         return [twos_comp(low,12)*lsb,twos_comp(high,12)*lsb]
 
 
@@ -371,11 +501,7 @@ class ADS1015:
             b = 0
         else:
             b = 1
-        reg = self.get_config_reg() & COMPARATOR_POLARITY_MASK
-        data = reg | (b << COMPARATOR_POLARITY_SHIFT)
-        data = hword_to_byte_list(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(self.i2c_addr,CONFIG_REG,data)
+        self._update_config(COMPARATOR_POLARITY_MASK, (b << COMPARATOR_POLARITY_SHIFT))
     
 
     def get_comparator_polarity(self):
@@ -384,7 +510,7 @@ class ADS1015:
         :return: Comparator polarity
         :rtype: str
         """
-        data = 0b1 & (self.get_config_reg() >> COMPARATOR_POLARITY_SHIFT)
+        data = 0b1 & (self._read_reg(CONFIG_REG) >> COMPARATOR_POLARITY_SHIFT)
         if data == 1:
             return "Active High"
         return "Active Low"
@@ -392,11 +518,216 @@ class ADS1015:
     def reset(self):
         """Resets ADS1015 to default values and settings
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = 0x06 # reset value
             # Write a single byte
             msg = i2c_msg.write(0x00, [data])
             bus.i2c_rdwr(msg)
+        self.invalidate()
+
+    def read_conversion_reg(self):
+        """Read the 16 bit conversion register without starting a new conversion, for continuous mode
+
+        :return: Returns 16 bits value in int
+        :rtype: int
+        """
+        with self.i2c_dev as bus:
+            return list_to_bits(bus.read_i2c_block_data(self.i2c_addr,CONVERSION_REG,2))
+
+    def read_conversion(self):
+        """Read the latest conversion without starting a new one, for continuous mode
+
+        :return: Signed 12 bit conversion code
+        :rtype: int
+        """
+        return twos_comp(self.read_conversion_reg(),16) >> CONVERSION_SHIFT
+
+    def _continuous_samples(self, channel, rate):
+        """Run the ADC in continuous mode and yield samples as they are converted\n
+        Paced by the ALERT/RDY edge if enable_ready_pin() was called, else by the data rate.
+        The previous mode is restored when the generator is closed.
+
+        :return: Generator of (timestamp, conversion register, dropped), dropped = samples missed before this one
+        :rtype: generator
+        """
+        mode = self.get_mode()
+        self.set_mux(channel)
+        self.set_sample_rate(rate)
+        self.set_mode("continous")
+        period = 1.0 / rate
+        timeout = period * RATE_TOLERANCE * TIMEOUT_PERIODS
+        try:
+            if self._ready is not None:
+                self._ready.clear()
+            last = time.monotonic()
+            due = last + period
+            while True:
+                if self._ready is not None:
+                    self._ready.wait(timeout)
+                    self._ready.clear()
+                else:
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    due = max(due + period, time.monotonic())
+                data = self.read_conversion_reg()
+                now = time.monotonic()
+                dropped = max(0, int((now - last) / period + 0.5) - 1)
+                last = now
+                yield now, data, dropped
+        finally:
+            self.set_mode(mode)
+
+    def stream(self, channel="in0/gnd", rate=3300, n=None, duration=None):
+        """Stream voltages in continuous mode at the programmed data rate\n
+        Stops after n samples or duration seconds, whichever comes first, or when the caller stops iterating.
+        e.g. for t, v, dropped in adc.stream("in0/gnd", 3300, n=1000): ...
+
+        :param channel: Mux setting, defaults to "in0/gnd"
+        :type channel: str
+        :param rate: Sampling rate, defaults to 3300
+        :type rate: int
+        :param n: Number of samples, defaults to None
+        :type n: int
+        :param duration: Time in seconds, defaults to None
+        :type duration: float
+        :return: Generator of (timestamp, voltage, dropped)
+        :rtype: generator
+        """
+        lsb = (self.get_gain()*2)/(2**12)
+        samples = self._continuous_samples(channel, rate)
+        end = None if duration is None else time.monotonic() + duration
+        count = 0
+        try:
+            for t, data, dropped in samples:
+                yield t, (twos_comp(data,16) >> CONVERSION_SHIFT)*lsb, dropped
+                count += 1
+                if (n is not None and count >= n) or (end is not None and t >= end):
+                    return
+        finally:
+            samples.close()
+
+    def start_acquisition(self, channel="in0/gnd", rate=3300, size=4096):
+        """Start a background thread streaming into a ring buffer, see Acquisition
+
+        :param channel: Mux setting, defaults to "in0/gnd"
+        :type channel: str
+        :param rate: Sampling rate, defaults to 3300
+        :type rate: int
+        :param size: Ring buffer size in samples, defaults to 4096
+        :type size: int
+        :return: Running acquisition
+        :rtype: Acquisition
+        """
+        acquisition = Acquisition(self, channel, rate, size)
+        acquisition.start()
+        return acquisition
+
+
+class RingBuffer:
+    def __init__(self, size=4096):
+        """Preallocated ring buffer of timestamped 16 bit conversion registers, kept big-endian for codec\n
+        When full, the oldest sample is overwritten and counted as an overrun.
+
+        :param size: Number of samples, defaults to 4096
+        :type size: int
+        """
+        self.size = size
+        self.codes = np.zeros(size, dtype=codec.DTYPE['u16'])
+        self.times = np.zeros(size, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.overruns = 0
+        self.lock = threading.Lock()
+
+    def put(self, timestamp, code):
+        with self.lock:
+            self.codes[self.head] = code
+            self.times[self.head] = timestamp
+            self.head = (self.head + 1) % self.size
+            if self.count == self.size:
+                self.overruns += 1
+            else:
+                self.count += 1
+
+    def get(self):
+        """Remove and return all buffered samples, oldest first
+
+        :return: Timestamps and conversion registers
+        :rtype: tuple of two numpy arrays
+        """
+        with self.lock:
+            index = (np.arange(self.count) + (self.head - self.count)) % self.size
+            times, codes = self.times[index], self.codes[index]
+            self.count = 0
+        return times, codes
+
+
+class Acquisition(threading.Thread):
+    def __init__(self, adc, channel="in0/gnd", rate=3300, size=4096):
+        """Background continuous-mode acquisition of one ADS1015 channel\n
+        dropped counts samples the thread was too slow to read,
+        buffer.overruns counts samples overwritten before read() collected them.
+        An error that ends the thread (e.g. an I2C error) is raised by the next read() or stop().
+
+        :param adc: ADC
+        :type adc: ADS1015
+        :param channel: Mux setting, defaults to "in0/gnd"
+        :type channel: str
+        :param rate: Sampling rate, defaults to 3300
+        :type rate: int
+        :param size: Ring buffer size in samples, defaults to 4096
+        :type size: int
+        """
+        threading.Thread.__init__(self, daemon=True)
+        self.adc = adc
+        self.channel = channel
+        self.rate = rate
+        self.buffer = RingBuffer(size)
+        self.dropped = 0
+        self.lsb = (adc.get_gain()*2)/(2**12)
+        self._stop_event = threading.Event()
+        self._error = None
+
+    def run(self):
+        try:
+            samples = self.adc._continuous_samples(self.channel, self.rate)
+            try:
+                for t, data, dropped in samples:
+                    self.dropped += dropped
+                    self.buffer.put(t, data)
+                    if self._stop_event.is_set():
+                        break
+            finally:
+                samples.close()
+        except Exception as error:
+            self._error = error
+
+    def _raise_error(self):
+        # Report the error of the thread once, samples buffered before it stay readable
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def read(self):
+        """Collect the buffered samples as voltages
+
+        :return: Timestamps and voltages
+        :rtype: tuple of two numpy arrays
+        :raises Exception: The error that ended the thread, once
+        """
+        self._raise_error()
+        times, codes = self.buffer.get()
+        return times, codec.to_volts(codes, self.lsb, 's16', CONVERSION_SHIFT)
+
+    def stop(self):
+        """Stop the thread and restore the previous conversion mode
+
+        :raises Exception: The error that ended the thread, if read() did not raise it yet
+        """
+        self._stop_event.set()
+        self.join()
+        self._raise_error()
 
 
 
@@ -1,11 +1,12 @@
 #!/usr/bin/python3
 from ads8661_driver import ADS8661
+from lazy import Lazy
 import gpio
 import struct
 
 # device and spi_ch
 spi_ch = 1
-adc = ADS8661(0, spi_ch)
+adc = Lazy(lambda: ADS8661(0, spi_ch))
 
 
 def get_voltage():
@@ -13,6 +14,12 @@ def get_voltage():
     #print("{} V".format(voltage))
     return voltage
 
+def capture(samples=1000,speed_hz=None):
+    # Burst capture, returns a numpy array of voltages
+    if speed_hz is not None:
+        adc.set_speed(speed_hz)
+    return adc.capture(int(samples))
+
 def get_raw_conversion():
     return hex(adc.get_conversion_raw())
 
@@ -30,5 +37,8 @@ def get_range():
 # reset is not in the driver file because it is controld by the PI's GPIO, not SPI
 def reset():
     gpio.adc_rst()
+    # Only a created device has cached settings to forget
+    if adc.is_created():
+        adc.invalidate()
     print("AGS8661 ADC reset!")
 
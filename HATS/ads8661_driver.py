@@ -1,9 +1,13 @@
 import spidev
-import struct
-import time
+import codec
+
+''' SPI clock '''
+SPI_SPEED = 100000
+MAX_SPI_SPEED = 66000000    # Max SCLK of the ADS8661
 
 '''OP codes '''
 NOP = 0x00000000
+NOP_FRAME = [0x00, 0x00, 0x00, 0x00]
 PAD8 = 0x00
 
 #write commands
@@ -32,6 +36,9 @@ RANGE = {"+-12.288":0b000,"+-10.24":0b001,"+-6.144":0b010,"+-5.12":0b011,
 LSB = {"+-12.288":0.006,"+-10.24":0.005,"+-6.144":0.003,"+-5.12":0.0025,
 "+-2.56":0.00125,"12.288":0.003,"10.24":0.0025,"6.144":0.0015,"5.12":0.00125}
 
+# Register value -> range name
+RANGE_NAME = {value: key for key, value in RANGE.items()}
+
 def to_32bit_list(command,reg,msb,lsb):
     """ Concatenate 4 bytes to a list\n
     e.g. C8140000 --> [200, 20, 0, 0]
@@ -47,13 +54,7 @@ def to_32bit_list(command,reg,msb,lsb):
     :return: List 
     :rtype: list
     """
-    command = command << 24
-    reg = reg << 16
-    msb = msb << 8
-    data = command | reg | msb | lsb
-    data = struct.pack('>I',data)
-    data = [b for b in data]
-    return data
+    return list(codec.U32.pack((command << 24) | (reg << 16) | (msb << 8) | lsb))
 
 def list_to_32bits(list):
     """Convert list of bytes back to 32 bits\n
@@ -64,13 +65,7 @@ def list_to_32bits(list):
     :return: 32 bit int
     :rtype: int
     """
-    i = 24 
-    data = 0x00000000
-    for x in list:
-        temp = x << i
-        i = i - 8
-        data = data | temp
-    return data
+    return codec.bytes_to_int(list) << (8 * (4 - len(list)))
 
 def list_to_16bits(list):
     """Convert list of bytes back to 16 bits
@@ -80,33 +75,46 @@ def list_to_16bits(list):
     :return: 16 bit int
     :rtype: int
     """
-    i = 8
-    data = 0x0000
-    for x in list:
-        temp = x << i
-        i = i - 8
-        data = data | temp
-    return data
+    return codec.bytes_to_int(list) << (8 * (2 - len(list)))
 
 
 class ADS8661(object):
     
-    def __init__(self,bus,device):
+    def __init__(self,bus,device,speed_hz=SPI_SPEED,verify=False):
         """Inits ADS8661
 
         :param bus: Bus
         :type bus: int
         :param device: SPI BUS
         :type device: int
+        :param speed_hz: SPI clock, up to MAX_SPI_SPEED, defaults to SPI_SPEED
+        :type speed_hz: int
+        :param verify: Re-read the range register on every voltage read, defaults to False
+        :type verify: bool
         """
+        self.verify = verify
+        # Active range register value and LSB, None until set or read
+        self.range = None
+        self.scale = None
         self.spi = spidev.SpiDev()
         self.spi.open(bus, device)
-        self.spi.max_speed_hz = 100000
+        self.set_speed(speed_hz)
         self.spi.mode = 0b00
         # Include range value in output data
         self.set_dataout_ctr_reg(0x01,0x00)
 
     
+    def set_speed(self,speed_hz=SPI_SPEED):
+        """Set the SPI clock, clamped to MAX_SPI_SPEED
+
+        :param speed_hz: SPI clock in Hz, defaults to SPI_SPEED
+        :type speed_hz: int
+        :return: Clock set
+        :rtype: int
+        """
+        self.spi.max_speed_hz = min(int(speed_hz), MAX_SPI_SPEED)
+        return self.spi.max_speed_hz
+
     def set_dataout_ctr_reg(self,msb=0x00,lsb=0x00):
         """Set lower 16 bit of data control register
 
@@ -162,10 +170,11 @@ class ADS8661(object):
         :type range: str
         """
         t = RANGE[range]
-        self.range = t
         r = PAD8 | t
         data = to_32bit_list(WLSB,RANGE_SEL_REG,PAD8,r)
         self.spi.writebytes(data)
+        self.range = t
+        self.scale = LSB[range]
 
     def get_range_sel_reg(self):
         """Set lower 16 bits of range_sel_reg
@@ -179,17 +188,35 @@ class ADS8661(object):
         b = self.spi.readbytes(2)
         return b
 
-    def get_range(self):
-        """Returns current range value in string
+    def get_range(self,verify=False):
+        """Returns current range value in string\n
+        The range is cached, the register is only read if unknown or verify is set
 
+        :param verify: Read the register even if the range is cached, defaults to False
+        :type verify: bool
         :return: Range
         :rtype: str
         """
-        data = self.get_range_sel_reg()
-        data = list_to_16bits(data)
-        for key, value in RANGE.items():  # for name, age in dictionary.iteritems():  (for Python 2.x)
-            if value == data:
-                return key
+        if self.range is None or verify:
+            data = list_to_16bits(self.get_range_sel_reg())
+            self.range = data
+            self.scale = LSB.get(RANGE_NAME.get(data))
+        return RANGE_NAME.get(self.range)
+
+    def get_scale(self):
+        """Returns the LSB (V) of the current range, see get_range()
+
+        :return: Scale
+        :rtype: float
+        """
+        self.get_range(self.verify)
+        return self.scale
+
+    def invalidate(self):
+        """Forget the cached range, e.g. after a reset through gpio.adc_rst()
+        """
+        self.range = None
+        self.scale = None
 
     def get_conversion_raw(self):
         """Get 32 bit raw conversion value 
@@ -197,9 +224,7 @@ class ADS8661(object):
         :return: list of 4 bytes
         :rtype: list
         """
-        data = struct.pack('>I',NOP)
-        data = [b for b in data]
-        self.spi.writebytes(data)
+        self.spi.writebytes(NOP_FRAME)
         b = self.spi.readbytes(4)
         v = list_to_32bits(b)
         return v
@@ -210,7 +235,7 @@ class ADS8661(object):
         :return: Voltage
         :rtype: float
         """
-        scale = LSB[self.get_range()]
+        scale = self.get_scale()
         #print(scale)
         data = self.get_conversion_raw()
         data = data >> 20
@@ -218,6 +243,25 @@ class ADS8661(object):
         return voltage
 
 
+    def capture(self,n=1000):
+        """Burst capture of n conversions\n
+        The range is looked up once, then every frame is a single 32 bit NOP transfer that
+        clocks out the previous conversion and starts the next one on CS rising edge.
+
+        :param n: Number of samples, defaults to 1000
+        :type n: int
+        :return: Voltages
+        :rtype: numpy array
+        """
+        scale = self.get_scale()
+        read = self.spi.readbytes
+        data = bytearray()
+        # First frame only starts the first conversion
+        for _ in range(n + 1):
+            data += bytes(read(4))
+        return codec.to_volts(data[4:], scale, 'u32', 20)
+
+
     '''Additional functionds can be built with GPO pin
     Alarm and threshold settings'''
 
@@ -0,0 +1,87 @@
+import numpy as np
+import struct
+
+''' Precompiled big-endian register formats '''
+U32 = struct.Struct('>I')
+
+''' NumPy dtypes of big-endian register frames '''
+DTYPE = {'u16': np.dtype('>u2'),
+         's16': np.dtype('>i2'),
+         'u32': np.dtype('>u4')}
+
+
+def bytes_to_int(data):
+    """Convert big-endian bytes (MSB first) to int\n
+    e.g. [0x12,0x34] --> 0x1234
+
+    :param data: List of bytes or bytes
+    :type data: list
+    :return: Unsigned value
+    :rtype: int
+    """
+    return int.from_bytes(bytes(data), 'big')
+
+
+def int_to_bytes(value, length=2):
+    """Convert int to list of big-endian bytes (MSB first)\n
+    e.g. 0x1234 --> [0x12,0x34]
+
+    :param value: Value, negative values are sent as two's complement
+    :type value: int
+    :param length: Number of bytes, defaults to 2
+    :type length: int
+    :return: List of bytes
+    :rtype: list
+    """
+    return list((value & ((1 << (8*length)) - 1)).to_bytes(length, 'big'))
+
+
+def twos_comp(val, bits):
+    """Compute the 2's complement of int value val
+
+    :param val: Value to be compute
+    :type val: int
+    :param bits: Number of bits to represent value
+    :type bits: int
+    :return: 2's complement of int value
+    :rtype: int
+    """
+    if val & (1 << (bits - 1)):
+        val -= 1 << bits
+    return val
+
+
+def decode(buffer, fmt='u16', shift=0):
+    """Decode a captured buffer of big-endian frames in one call\n
+    e.g. decode(data, 's16', 4) --> signed 12 bit ADS1015 codes
+
+    :param buffer: Captured bytes, length a multiple of the frame size
+    :type buffer: bytes
+    :param fmt: Frame format, 'u16', 's16' or 'u32', defaults to 'u16'
+    :type fmt: str
+    :param shift: Right shift applied to every frame, defaults to 0
+    :type shift: int
+    :return: Codes in native byte order
+    :rtype: numpy array
+    """
+    codes = np.frombuffer(buffer, dtype=DTYPE[fmt]).astype(DTYPE[fmt].newbyteorder('='))
+    if shift:
+        codes >>= shift
+    return codes
+
+
+def to_volts(buffer, lsb, fmt='u16', shift=0):
+    """Decode a captured buffer to volts in one call, see decode()
+
+    :param buffer: Captured bytes
+    :type buffer: bytes
+    :param lsb: Volts per code
+    :type lsb: float
+    :param fmt: Frame format, 'u16', 's16' or 'u32', defaults to 'u16'
+    :type fmt: str
+    :param shift: Right shift applied to every frame, defaults to 0
+    :type shift: int
+    :return: Volts
+    :rtype: numpy array
+    """
+    return decode(buffer, fmt, shift) * lsb
@@ -1,8 +1,9 @@
 from ds1050_driver import DS1050
+from lazy import Lazy
 
 I2C_ADDR = 0x28
 # initialize IC
-ds1050 = DS1050(I2C_ADDR)
+ds1050 = Lazy(lambda: DS1050(I2C_ADDR))
 
 
 '''
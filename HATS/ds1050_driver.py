@@ -1,4 +1,5 @@
-from smbus2 import SMBus, i2c_msg
+from smbus2 import i2c_msg
+import i2c_bus
 
 I2C_ADDR = 0x28
 
@@ -17,13 +18,13 @@ class DS1050:
 
         :param i2c_addr: I2C address, defaults to I2C_ADDR
         :type i2c_addr: Hex
-        :param i2c_dev: Defaults to None
+        :param i2c_dev: Bus number or i2c_bus.I2CBus session, defaults to None (shared session of bus 1)
         :type i2c_dev: int
 
 
         """
         self._i2c_addr = i2c_addr
-        self._i2c_dev = i2c_dev
+        self._i2c_dev = i2c_bus.get_bus(i2c_dev)
 
     def set_cycle(self,step=16):
         """ Sets PWM duty cycle\n
@@ -33,7 +34,7 @@ class DS1050:
         :type step: int
         """
         step |= 0x00
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             msg = i2c_msg.write(I2C_ADDR, [step])
             bus.i2c_rdwr(msg)
 
@@ -41,21 +42,21 @@ class DS1050:
         """Sets the duty cycle to 100%
         """
        
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             msg = i2c_msg.write(I2C_ADDR, [0x20])
             bus.i2c_rdwr(msg)
                
     def shutdown(self):
         """ Goes into shutdown mode, low current 
         """
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             msg = i2c_msg.write(I2C_ADDR, [0xC0])
             bus.i2c_rdwr(msg)
             
     def wakeup(self):
         """ Recalls the ic from shutdown mode
         """
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             msg = i2c_msg.write(I2C_ADDR, [0x80])
             bus.i2c_rdwr(msg)
             
@@ -65,6 +66,6 @@ class DS1050:
 
         :return: 5 Bit Binary, 00000b to 11111b
         """
-        with SMBus(1) as bus:
+        with self._i2c_dev as bus:
             data = bus.read_byte(I2C_ADDR)
         return data
\ No newline at end of file
@@ -1,4 +1,5 @@
-import RPi.GPIO as GPIO
+import os
+import threading
 import time
 
 ''' Pins '''
@@ -18,23 +19,89 @@ CE0 = 8
 
 
 
-# Pin Setup:
-GPIO.setmode(GPIO.BCM) # Broadcom pin-numbering scheme
-GPIO.setwarnings(False) # disable runtime warning message
-GPIO.setup(MATRIX_1_RST, GPIO.OUT)
-GPIO.setup(MATRIX_2_RST, GPIO.OUT)
-GPIO.setup(ADC_RST, GPIO.OUT)
-GPIO.setup(DAC_EN, GPIO.OUT)
-GPIO.setup(LDO_EN, GPIO.OUT)
-GPIO.setup(RELAY_RST, GPIO.OUT)
-GPIO.setup(DC5V_EN, GPIO.OUT)
-GPIO.setup(DC1V8_EN, GPIO.OUT)
-GPIO.setup(DC3V3_EN, GPIO.OUT)    
-GPIO.setup(PGA_G0, GPIO.OUT)
-GPIO.setup(PGA_G1, GPIO.OUT)
-GPIO.setup(PGA_G2, GPIO.OUT)
+OUTPUTS = [MATRIX_1_RST,MATRIX_2_RST,ADC_RST,DAC_EN,LDO_EN,RELAY_RST,
+           DC5V_EN,DC1V8_EN,DC3V3_EN,PGA_G0,PGA_G1,PGA_G2,CE0]
 
-GPIO.setup(CE0, GPIO.OUT)
+''' Backend, RPi.GPIO unless set_backend() is called or HATS_GPIO=fake '''
+_backend = None
+_ready = False
+_lock = threading.Lock()
+
+
+class FakeGPIO:
+    """Stand-in for RPi.GPIO on hosts without GPIO, e.g. CI dry runs.
+    Output levels are kept in pins.
+    """
+    BCM = 11
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+
+    def __init__(self):
+        self.pins = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.pins.setdefault(pin, self.LOW)
+
+    def output(self, pin, value):
+        self.pins[pin] = value
+
+    def input(self, pin):
+        return self.pins.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None):
+        pass
+
+    def remove_event_detect(self, pin):
+        pass
+
+
+def set_backend(backend=None):
+    """Select the GPIO backend, pins are set up again on next use\n
+    e.g. set_backend(FakeGPIO()) on a host without GPIO
+
+    :param backend: RPi.GPIO compatible module or object, defaults to None (RPi.GPIO)
+    :type backend: module
+    """
+    global _backend, _ready
+    with _lock:
+        _backend = backend
+        _ready = False
+
+
+def backend():
+    """Get the GPIO backend, importing RPi.GPIO and setting up the pins on first use
+
+    :return: RPi.GPIO compatible backend
+    :rtype: module
+    """
+    global _backend, _ready
+    if not _ready:
+        with _lock:
+            if _backend is None:
+                if os.environ.get("HATS_GPIO") == "fake":
+                    _backend = FakeGPIO()
+                else:
+                    import RPi.GPIO
+                    _backend = RPi.GPIO
+            if not _ready:
+                # Pin Setup:
+                _backend.setmode(_backend.BCM) # Broadcom pin-numbering scheme
+                _backend.setwarnings(False) # disable runtime warning message
+                for pin in OUTPUTS:
+                    _backend.setup(pin, _backend.OUT)
+                _ready = True
+    return _backend
 
 
 vdict = {5:DC5V_EN,3.3:DC3V3_EN,1.8:DC1V8_EN}
@@ -53,6 +120,7 @@ def dcdc_en(arr=[],bool=False):
     :param bool: On= True, Off = False, defaults to False
     :type bool: bool
     """
+    GPIO = backend()
     for v in arr:
         if(bool==True):
             GPIO.output(vdict[v], GPIO.HIGH)
@@ -60,6 +128,7 @@ def dcdc_en(arr=[],bool=False):
             GPIO.output(vdict[v], GPIO.LOW)
         
 def dac_en(bool=True):
+    GPIO = backend()
     if(bool == False):
         GPIO.output(DAC_EN, GPIO.LOW)
     elif(bool == True):
@@ -72,6 +141,7 @@ def ldo_en(bool=False):
     :param bool: On = True, off = False defaults to False
     :type bool: bool
     """
+    GPIO = backend()
     if(bool == False):
         GPIO.output(LDO_EN, GPIO.LOW)
     elif(bool == True):
@@ -80,6 +150,7 @@ def ldo_en(bool=False):
 def adc_rst():
     """Resets ADS8661
     """
+    GPIO = backend()
     GPIO.output(ADC_RST, GPIO.LOW)
     time.sleep(0.1)
     GPIO.output(ADC_RST, GPIO.HIGH)
@@ -87,6 +158,7 @@ def adc_rst():
 def relay_rst():
     """Resets relay
     """
+    GPIO = backend()
     GPIO.output(RELAY_RST, GPIO.LOW)
     time.sleep(0.1)
     GPIO.output(RELAY_RST, GPIO.HIGH)
@@ -94,6 +166,7 @@ def relay_rst():
 def matrix_1_rst():
     """Resets Crosspoint matrix 1
     """
+    GPIO = backend()
     GPIO.output(MATRIX_1_RST, GPIO.LOW)
     time.sleep(0.1)
     GPIO.output(MATRIX_1_RST, GPIO.HIGH)
@@ -101,6 +174,7 @@ def matrix_1_rst():
 def matrix_2_rst():
     """Resets Crosspoint matrix 2
     """
+    GPIO = backend()
     GPIO.output(MATRIX_2_RST, GPIO.LOW)
     time.sleep(0.1)
     GPIO.output(MATRIX_2_RST, GPIO.HIGH)
@@ -112,6 +186,7 @@ def set_pga_gain(gain=1):
     :param gain: Gain
     :type gain: int
     """
+    GPIO = backend()
     bits = PGA_GAIN[gain]
     G0 = bits & 0x1
     G1 = bits & 0x2 
@@ -127,6 +202,7 @@ def set_pga_gain(gain=1):
             GPIO.output(PGA_DICT[i], GPIO.HIGH)
 
 def testing():
+    GPIO = backend()
     GPIO.output(CE0,GPIO.HIGH)
 
 #ldo_en(False)
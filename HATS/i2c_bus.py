@@ -0,0 +1,183 @@
+from smbus2 import SMBus
+import threading
+import atexit
+import time
+
+''' Default I2C bus of the Raspberry Pi header (/dev/i2c-1) '''
+DEFAULT_BUS = 1
+
+''' i2c_msg flag for read messages '''
+I2C_M_RD = 0x0001
+
+''' Registry of open bus sessions, keyed by bus number '''
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class FakeSMBus:
+    # Register contents outlive a close/reopen, like a real device
+    memory = {}
+
+    def __init__(self, bus=DEFAULT_BUS):
+        """In-memory stand-in for SMBus, used to benchmark and test the drivers
+        without hardware.\n
+        Block writes are stored per (address, register) and read back unchanged.
+        Raw writes (i2c_rdwr/write_byte) are stored per address and returned by read_byte.
+
+        :param bus: Bus number, only kept for reference, defaults to DEFAULT_BUS
+        :type bus: int
+        """
+        self.bus = bus
+        self.registers = FakeSMBus.memory.setdefault(bus, {})
+        self.transactions = 0
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        self.transactions += 1
+        data = self.registers.get((i2c_addr, register), [])
+        return (list(data) + [0] * length)[:length]
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        self.transactions += 1
+        self.registers[(i2c_addr, register)] = list(data)
+
+    def read_byte(self, i2c_addr, force=None):
+        self.transactions += 1
+        return self.registers.get((i2c_addr, None), [0])[-1]
+
+    def write_byte(self, i2c_addr, value, force=None):
+        self.transactions += 1
+        self.registers[(i2c_addr, None)] = [value]
+
+    def i2c_rdwr(self, *i2c_msgs):
+        # Read messages are left zeroed
+        for msg in i2c_msgs:
+            self.transactions += 1
+            if not msg.flags & I2C_M_RD:
+                self.registers[(msg.addr, None)] = list(msg)
+
+    def close(self):
+        pass
+
+
+class I2CBus:
+    def __init__(self, bus=DEFAULT_BUS, backend=SMBus, persistent=True):
+        """Inits a shared I2C bus session\n
+        The session keeps one open file descriptor for the bus and serializes access with a lock.
+        Use it as a context manager in place of SMBus, e.g. "with session as bus:".
+
+        :param bus: Bus number, e.g. 1 for /dev/i2c-1, defaults to DEFAULT_BUS
+        :type bus: int
+        :param backend: Callable returning an SMBus-like object for a bus number, defaults to SMBus
+        :type backend: callable
+        :param persistent: Keep the bus open between transactions, False reopens it every time, defaults to True
+        :type persistent: bool
+        """
+        self.bus = bus
+        self.backend = backend
+        self.persistent = persistent
+        self.lock = threading.RLock()
+        self._dev = None
+
+    def open(self):
+        """Opens the bus if it is not open yet
+
+        :return: SMBus-like object
+        :rtype: SMBus
+        """
+        with self.lock:
+            if self._dev is None:
+                self._dev = self.backend(self.bus)
+            return self._dev
+
+    def close(self):
+        """Closes the bus, it will be reopened on the next transaction
+        """
+        with self.lock:
+            if self._dev is not None:
+                self._dev.close()
+                self._dev = None
+
+    def set_backend(self, backend=SMBus):
+        """Swap the bus backend, e.g. to FakeSMBus for benchmarks\n
+        Drivers already holding this session pick up the new backend on their next transaction.
+
+        :param backend: Callable returning an SMBus-like object, defaults to SMBus
+        :type backend: callable
+        """
+        with self.lock:
+            self.close()
+            self.backend = backend
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            return self.open()
+        except Exception:
+            self.lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if not self.persistent:
+                self.close()
+        finally:
+            self.lock.release()
+        return False
+
+
+def get_bus(i2c_dev=None):
+    """Get the shared session of a bus\n
+    i2c_dev options: None (default bus), a bus number or a session object (returned as is)
+
+    :param i2c_dev: Bus number or session, defaults to None
+    :type i2c_dev: int
+    :return: Bus session
+    :rtype: I2CBus
+    """
+    if hasattr(i2c_dev, "__enter__"):
+        return i2c_dev
+    bus = DEFAULT_BUS if i2c_dev is None else int(i2c_dev)
+    with _sessions_lock:
+        if bus not in _sessions:
+            _sessions[bus] = I2CBus(bus)
+        return _sessions[bus]
+
+
+def close_all():
+    """Closes every open bus session
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+
+atexit.register(close_all)
+
+
+def calls_per_second(func, duration=1.0):
+    """Call func repeatedly for a duration and return the call rate
+
+    :param func: Function without arguments
+    :type func: callable
+    :param duration: Benchmark time in seconds, defaults to 1.0
+    :type duration: float
+    :return: Calls per second
+    :rtype: float
+    """
+    n = 0
+    start = time.perf_counter()
+    end = start + duration
+    while time.perf_counter() < end:
+        func()
+        n += 1
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    # Compare a persistent session against reopening the bus on every transaction
+    # get_config_reg is one register read, get_voltage would mostly time the conversion wait
+    from ads1015_driver import ADS1015
+    for persistent in (False, True):
+        session = I2CBus(DEFAULT_BUS, FakeSMBus, persistent)
+        adc = ADS1015(0x49, i2c_dev=session)
+        rate = calls_per_second(adc.get_config_reg)
+        print("persistent={}: {:.0f} get_config_reg/s".format(persistent, rate))
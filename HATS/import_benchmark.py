@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+''' Measures the import time of the Robot libraries, each in a fresh interpreter.
+Run with HATS_GPIO=fake on a host without GPIO, e.g. HATS_GPIO=fake python3 import_benchmark.py '''
+import subprocess
+import sys
+import os
+
+MODULES = ['gpio','pga','ad9833','adg2128','adg715','ads1015','ads8661','ds1050','ina260']
+
+CODE = '''import time
+t = time.perf_counter()
+import {}
+print((time.perf_counter() - t) * 1000)'''
+
+
+def import_time(module):
+    """Import a module in a new interpreter and return the time taken
+
+    :param module: Module name
+    :type module: str
+    :return: Import time in ms
+    :rtype: float
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.check_output([sys.executable, '-c', CODE.format(module)], cwd=here)
+    return float(out)
+
+
+if __name__ == "__main__":
+    for m in MODULES:
+        print('{:<10} {:8.1f} ms'.format(m, import_time(m)))
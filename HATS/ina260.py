@@ -1,9 +1,10 @@
-from ina260_driver import INA260
+from ina260_driver import INA260, decode_log
+from lazy import Lazy
 
 I2C_ADDR = 0x40
 
 # Initialize IC
-ina260 = INA260(I2C_ADDR)
+ina260 = Lazy(lambda: INA260(I2C_ADDR))
 
 def get_voltage():
     voltage = ina260.get_voltage()
@@ -26,6 +27,17 @@ def get_all():
     get_current()
     get_power()
 
+def log(period=0,duration=1,path=None):
+    # Log current, voltage and power every conversion cycle (or period seconds)
+    records = ina260.log(float(period),float(duration),path)
+    if path is not None:
+        print("{} records written to {}".format(records,path))
+        return records
+    records = decode_log(records)
+    if len(records):
+        print("{} records, current {} A to {} A".format(len(records),records['current'].min(),records['current'].max()))
+    return records
+
 def get_id():
     print(ina260.get_id())
 
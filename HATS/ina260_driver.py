@@ -1,5 +1,8 @@
-from smbus2 import SMBus, i2c_msg
+import codec
+import i2c_bus
+import numpy as np
 import struct
+import time
 ''' device address '''
 I2C_ADDR = 0x40
 
@@ -8,6 +11,7 @@ CONFIG_REG = 0x00
 CURRENT_REG = 0x01
 VOLTAGE_REG = 0x02
 POWER_REG = 0x03
+MASK_ENABLE_REG = 0x06
 ID_REG = 0xFE
 
 ''' configuration register fields '''
@@ -15,6 +19,23 @@ RESET = 0x8000
 DEFAULT_CONFIG = 0x6127
 AVERAGE = {1:0b000,4:0b001,16:0b010,64:0b011,128:0b100,256:0b101,512:0b110,1024:0b111}
 MODE = {"triggered":0b011,"continous":0b111}
+VBUSCT_SHIFT = 6
+ISHCT_SHIFT = 3
+''' conversion time (s) per VBUSCT/ISHCT setting '''
+CONVERSION_TIME = {0b000:0.000140,0b001:0.000204,0b010:0.000332,0b011:0.000588,
+                   0b100:0.001100,0b101:0.002116,0b110:0.004156,0b111:0.008244}
+
+''' mask/enable register fields '''
+CVRF = 0x0008 # Conversion ready flag, cleared by reading the register
+
+''' LSB of current/voltage/power registers '''
+CURRENT_LSB = 0.00125
+VOLTAGE_LSB = 0.00125
+POWER_LSB = 0.01
+
+''' log record: timestamp and raw current (signed), voltage and power registers '''
+LOG_RECORD = struct.Struct('<dhHH')
+LOG_DTYPE = np.dtype([('time','<f8'),('current','<i2'),('voltage','<u2'),('power','<u2')])
 
 
 
@@ -27,11 +48,7 @@ def list_to_word(list):
     :rtype: int
 
     """
-    msb = list[0]
-    lsb = list[1]
-    msb = msb << 8
-    word = msb | lsb
-    return(word) 
+    return codec.bytes_to_int(list[:2])
 
 def word_to_bytes(word):
     """ Convert 16 bits into list of 2 bytes
@@ -41,12 +58,32 @@ def word_to_bytes(word):
     :return: list of 2 bytes
     :rtype: list
     """
-    list = []
-    msb = (word & 0xFF00) >> 8
-    lsb = word & 0x00FF
-    list.append(msb)
-    list.append(lsb)
-    return list
+    return codec.int_to_bytes(word, 2)
+
+def read_log(path):
+    """Read a binary log file written by INA260.log()
+
+    :param path: File path
+    :type path: str
+    :return: Raw records, see LOG_DTYPE
+    :rtype: numpy structured array
+    """
+    return np.fromfile(path, dtype=LOG_DTYPE)
+
+def decode_log(records):
+    """Scale raw log records to seconds, A, V and W
+
+    :param records: Raw records, see LOG_DTYPE
+    :type records: numpy structured array
+    :return: Records with float fields time, current, voltage, power
+    :rtype: numpy structured array
+    """
+    out = np.empty(len(records), dtype=[('time','<f8'),('current','<f8'),('voltage','<f8'),('power','<f8')])
+    out['time'] = records['time']
+    out['current'] = records['current'] * CURRENT_LSB
+    out['voltage'] = records['voltage'] * VOLTAGE_LSB
+    out['power'] = records['power'] * POWER_LSB
+    return out
 
 class INA260:
     def __init__(self, i2c_addr=I2C_ADDR,i2c_dev=None):
@@ -54,11 +91,13 @@ class INA260:
 
         :param i2c_addr: I2C address, defaults to I2C_ADDR
         :type i2c_addr: hexadecimal
-        :param i2c_dev: int, defaults to None
+        :param i2c_dev: Bus number or i2c_bus.I2CBus session, defaults to None (shared session of bus 1)
         :type i2c_dev: int
         """
         self.i2c_addr = i2c_addr
-        self.i2c_dev = i2c_dev
+        self.i2c_dev = i2c_bus.get_bus(i2c_dev)
+        # Last config written by this driver, None until written
+        self.config = None
     
     def get_voltage(self):
         """Get voltage from voltage bus
@@ -67,9 +106,9 @@ class INA260:
         :rtype: float
         """
         if(self.get_mode() == "triggered"):
-            self.set_mode("triggered")
+            self._write_config(self.config)
             #print("triggered")
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = bus.read_i2c_block_data(I2C_ADDR,VOLTAGE_REG,2)
             return list_to_word(data)* 0.00125
 
@@ -79,7 +118,7 @@ class INA260:
         :return: Current
         :rtype: float
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = bus.read_i2c_block_data(I2C_ADDR,CURRENT_REG,2)
             return list_to_word(data)* 0.00125
 
@@ -90,7 +129,7 @@ class INA260:
         :return: Power (Voltage*Current)
         :rtype: float
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = bus.read_i2c_block_data(I2C_ADDR,POWER_REG,2)
             return list_to_word(data)* 0.01
 
@@ -100,10 +139,114 @@ class INA260:
         :return: ID of the IC
         :rtype: int
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = bus.read_i2c_block_data(I2C_ADDR,ID_REG,2)
             return list_to_word(data)
 
+    def _write_config(self, data):
+        """Write the config register and remember it
+
+        :param data: 16 bit config
+        :type data: int
+        """
+        with self.i2c_dev as bus:
+            bus.write_i2c_block_data(I2C_ADDR,CONFIG_REG,word_to_bytes(data))
+        self.config = data
+
+    def _get_config(self):
+        """Config register as int, from the last write or read over I2C if unknown
+
+        :return: 16 bit config
+        :rtype: int
+        """
+        if self.config is None:
+            self.config = int(self.read_config(),16)
+        return self.config
+
+    def conversion_time(self):
+        """Time of one full conversion cycle (bus voltage + current, times the averages)
+
+        :return: Time in seconds
+        :rtype: float
+        """
+        data = self._get_config()
+        vbusct = (data >> VBUSCT_SHIFT) & 0b111
+        ishct = (data >> ISHCT_SHIFT) & 0b111
+        return (CONVERSION_TIME[vbusct] + CONVERSION_TIME[ishct]) * self.get_average()
+
+    def conversion_ready(self):
+        """Check the conversion ready flag (CVRF) of the mask/enable register, reading clears it
+
+        :return: Boolean
+        :rtype: Boolean
+        """
+        with self.i2c_dev as bus:
+            data = list_to_word(bus.read_i2c_block_data(I2C_ADDR,MASK_ENABLE_REG,2))
+        return bool(data & CVRF)
+
+    def read_all(self):
+        """Read current, voltage and power registers in one bus session
+
+        :return: Raw current (signed), voltage and power registers
+        :rtype: tuple
+        """
+        with self.i2c_dev as bus:
+            current = list_to_word(bus.read_i2c_block_data(I2C_ADDR,CURRENT_REG,2))
+            voltage = list_to_word(bus.read_i2c_block_data(I2C_ADDR,VOLTAGE_REG,2))
+            power = list_to_word(bus.read_i2c_block_data(I2C_ADDR,POWER_REG,2))
+        return codec.twos_comp(current, 16), voltage, power
+
+    def log(self, period=0, duration=1.0, path=None):
+        """Log current, voltage and power together once per conversion cycle\n
+        Each cycle waits for the conversion ready flag, polled at a fraction of the
+        conversion time implied by AVERAGE and the conversion times (at most two cycles). In triggered mode a
+        conversion is triggered every cycle. period below the conversion time is raised to it.
+
+        :param period: Minimum time between records in seconds, defaults to 0 (every conversion)
+        :type period: float
+        :param duration: Logging time in seconds, defaults to 1.0
+        :type duration: float
+        :param path: Binary file to append LOG_RECORD records to, defaults to None (keep in memory)
+        :type path: str
+        :return: Records kept in memory, see LOG_DTYPE, or the number of records written to path
+        :rtype: numpy structured array or int
+        """
+        conversion = self.conversion_time()
+        period = max(period, conversion)
+        triggered = self.get_mode() == "triggered"
+        poll = conversion / 10
+        records = np.zeros(int(duration / period) + 1, dtype=LOG_DTYPE)
+        f = open(path, 'ab') if path is not None else None
+        n = 0
+        try:
+            self.conversion_ready() # clear a stale flag
+            end = time.monotonic() + duration
+            due = time.monotonic()
+            while n < len(records) and time.monotonic() < end:
+                if triggered:
+                    self._write_config(self.config)
+                # Give up waiting after two conversion cycles
+                timeout = time.monotonic() + 2 * conversion
+                while not self.conversion_ready() and time.monotonic() < timeout:
+                    time.sleep(poll)
+                t = time.time()
+                current, voltage, power = self.read_all()
+                if f is not None:
+                    f.write(LOG_RECORD.pack(t, current, voltage, power))
+                else:
+                    records[n] = (t, current, voltage, power)
+                n += 1
+                due += period
+                wait = due - time.monotonic() - conversion
+                if wait > 0:
+                    time.sleep(wait)
+        finally:
+            if f is not None:
+                f.close()
+        if f is not None:
+            return n
+        return records[:n]
+
     def set_average(self,avg = 1):
         """Set the number of averages from the read data\n
         options : 1(default),4,16,64,128,256,512,1024
@@ -113,9 +256,7 @@ class INA260:
         """
         data = DEFAULT_CONFIG & 0xF1FF
         data |= AVERAGE[avg] << 9
-        data = word_to_bytes(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(I2C_ADDR,CONFIG_REG,data)
+        self._write_config(data)
 
     def set_mode(self,mode = "continous"):
         """ Set mode\n
@@ -125,9 +266,7 @@ class INA260:
         :type mode: str
         """
         data = (DEFAULT_CONFIG & 0xFFF0 )| MODE[mode]
-        data = word_to_bytes(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(I2C_ADDR,CONFIG_REG,data)
+        self._write_config(data)
 
     def set_all(self,avg =1 ,mode = "continous"):
         """Set all  values of the config register\n
@@ -142,9 +281,7 @@ class INA260:
         data = (DEFAULT_CONFIG & 0xFFF0 )| MODE[mode]
         data &= 0xF1FF
         data |= AVERAGE[avg] << 9
-        data = word_to_bytes(data)
-        with SMBus(1) as bus:
-            bus.write_i2c_block_data(I2C_ADDR,CONFIG_REG,data)
+        self._write_config(data)
 
     def read_config(self):
         """Reads the config register
@@ -152,9 +289,11 @@ class INA260:
         :return: 16 bit hex
         :rtype: hexadecimal
         """
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             data = bus.read_i2c_block_data(I2C_ADDR,CONFIG_REG,2)
-            return hex(list_to_word(data))
+            data = list_to_word(data)
+        self.config = data
+        return hex(data)
 
     def get_mode(self):
         """Get mode
@@ -162,8 +301,7 @@ class INA260:
         :return: Mode
         :rtype: str
         """
-        hex = self.read_config()
-        hex = int(hex,16)
+        hex = self._get_config()
         hex = hex & 0x0004
         if(hex == 4):
             return "continous"
@@ -176,9 +314,8 @@ class INA260:
         :return: Average
         :rtype: int
         """
-        hex = self.read_config()
-        hex = int(hex,16)
-        hex = (hex & 0x0700) >> 9
+        hex = self._get_config()
+        hex = (hex & 0x0E00) >> 9
         for avg, b in AVERAGE.items():  
             if b == hex:
                 return avg
@@ -187,8 +324,9 @@ class INA260:
         """Resets IC
         """
         data = word_to_bytes(RESET)
-        with SMBus(1) as bus:
+        with self.i2c_dev as bus:
             bus.write_i2c_block_data(I2C_ADDR,CONFIG_REG,data)
+        self.config = None
         print("IC reset!")
           
           
@@ -0,0 +1,40 @@
+import threading
+
+
+class Lazy(object):
+    def __init__(self, factory):
+        """Stand-in for a device object that is only created on first use\n
+        e.g. adc = Lazy(lambda: ADS8661(0, 1)) opens SPI on the first adc.get_voltage()
+
+        :param factory: Function without arguments returning the device object
+        :type factory: callable
+        """
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Get the device object, creating it if needed
+
+        :return: Device object
+        :rtype: object
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def is_created(self):
+        """Check if the device object was created
+
+        :return: Boolean
+        :rtype: bool
+        """
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        # Introspection (docs, Robot library loading) must not create the device
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
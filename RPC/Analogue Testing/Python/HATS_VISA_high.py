@@ -4,6 +4,10 @@ import HATS_VISA_oscilloscope as hv_os
 import HATS_VISA_multimeter as hv_mm
 import matplotlib.pyplot as plt
 import time
+import ast
+import copy
+import functools
+import shlex
 
 inst = dict()
 ### Function wrappers
@@ -13,11 +17,31 @@ def VISA_init():
     """
     return hv_base.VISA_init()
 
-def scan_resource():
+def scan_resource(refresh=False):
     """
-    Scan and return all available ports. Not all port type will be listed. Eg. available TCPIP type ports will not be listed
+    Scan and return all available ports, cached (refresh=True to rescan). Not all port type will be listed. Eg. available TCPIP type ports will not be listed
+    unless probed with set_discovery
     """
-    return hv_base.scan_resource()
+    return hv_base.scan_resource(_convert(refresh))
+
+def identify_resources(refresh=False):
+    """
+    Return the *IDN? reply (None if no answer) of every available TCPIP/USB port, queried in parallel.
+    Serial ports are only queried if listed in set_discovery identify.
+    """
+    return hv_base.discovery.identify(_convert(refresh))
+
+def set_discovery(ttl=hv_base.DISCOVERY_TTL, hosts='', timeout=hv_base.PROBE_TIMEOUT, background=False, identify=''):
+    """
+    Configure resource discovery: cache time (s), TCPIP hosts/subnets to probe eg. '192.168.1.10,192.168.2.0/24',
+    probe timeout (s), periodic background refresh and serial resources to also query *IDN? on eg. 'ASRL/dev/ttyUSB0::INSTR'.
+    """
+    hv_base.discovery.configure(ttl, hosts, timeout, identify=identify)
+    if _convert(background):
+        hv_base.discovery.start()
+    else:
+        hv_base.discovery.stop()
+    return 'Discovery configured'
         
 def opened_resource():
     """
@@ -31,6 +55,12 @@ def VISA_deinit():
     """
     return hv_base.VISA_deinit()
 
+def pool_status():
+    """
+    List pooled connections and the number of instruments using each.
+    """
+    return hv_base.pool.status()
+
 
 ###Instrument Creation
 def create_visainst(inst_name,port):
@@ -39,6 +69,7 @@ def create_visainst(inst_name,port):
     """
     global inst
     inst_name = str(inst_name)
+    _replace(inst_name)
     inst[inst_name] = hv_base.VISAinst(port)
     return inst[inst_name]
     
@@ -48,6 +79,7 @@ def create_oscilloscope(inst_name,port):
     """
     global inst
     inst_name = str(inst_name)
+    _replace(inst_name)
     inst[inst_name] = hv_os.oscilloscope(port)
     return inst[inst_name]
     
@@ -57,44 +89,103 @@ def create_multimeter(inst_name,port):
     """
     global inst
     inst_name = str(inst_name)
+    _replace(inst_name)
     inst[inst_name] = hv_mm.multimeter(port)
     return inst[inst_name]
     
-def inst_deinit(inst_name):
+def inst_deinit(inst_name, close=False):
     """
-    Delete instrument instance
+    Delete instrument instance and release its connection to the pool (close=True to close it)
     """
     global inst
     assert inst_name in inst
+    if _convert(close):
+        inst[inst_name].deinit()
+    else:
+        inst[inst_name].release()
     del inst[inst_name]
+    _forget(inst_name)
     inst_name = "'" + str(inst_name) + "'"
     return inst_name + ' closed'
     
 
 ###Methods & attribute wrapper
-    #Note: String arguments have to be exeplicitly wrapped "'str'"
+    #Note: String arguments no longer have to be wrapped "'str'", quoted strings are still accepted
     #rterminator/wterminator such as "'\n'" need to be input as "'\\n'" to send literal
+_dispatch = dict()  # (inst_name, func_name) --> bound method or attribute getter
+
+def _replace(inst_name):
+    # Release the connection of an instrument about to be re-created under the same name
+    if inst_name in inst:
+        inst[inst_name].release()
+        del inst[inst_name]
+    _forget(inst_name)
+
+def _forget(inst_name):
+    # Drop cached dispatch entries of a replaced/deleted instrument
+    for key in [key for key in _dispatch if key[0] == inst_name]:
+        del _dispatch[key]
+
+def _attribute(obj, name):
+    # Instance attributes are read on every call, a call with arguments calls the attribute
+    def get(*args):
+        value = getattr(obj, name)
+        return value(*args) if args else value
+    return get
+
+def _resolve(inst_name, func_name):
+    target = _dispatch.get((inst_name, func_name))
+    if target is None:
+        assert inst_name in inst
+        obj = inst[inst_name]
+        assert hasattr(obj, func_name)
+        if func_name in vars(obj):
+            target = _attribute(obj, func_name)
+        else:
+            target = getattr(obj, func_name)
+        _dispatch[(inst_name, func_name)] = target
+    return target
+
+@functools.lru_cache(maxsize=1024)
+def _convert_str(arg):
+    try:
+        return ast.literal_eval(arg)
+    except (ValueError, SyntaxError):
+        return arg
+
+def _convert(arg):
+    """
+    Convert a Robot argument: "1" --> 1, "0.5" --> 0.5, "'DC'"/"DC" --> 'DC', other types unchanged
+    """
+    if isinstance(arg, str):
+        value = _convert_str(arg)
+        # The cached list/dict/set is shared between calls, hand out a copy
+        if isinstance(value, (list, dict, set)):
+            return copy.deepcopy(value)
+        return value
+    return arg
+
 def inst_func(inst_name,func_name,*args):
     """
     Instrument instance wrapper
     """
-    global inst
-    assert inst_name in inst
-    assert func_name in dir(inst[inst_name])
-    att = func_name in vars(inst[inst_name])
-    func_arg = '('
-    for i in args:
-        func_arg = func_arg + str(i) + ','
-    func_arg = func_arg[:-1]
-    if len(func_arg) != 0:
-        func_arg = func_arg + ')'
-    elif att == 0: #Not an attribute
-        func_arg = '()'
-    comm = 'inst[\''+str(inst_name) +'\'].'+ str(func_name) + func_arg
-    resp = eval(comm)
+    inst_name = str(inst_name)
+    return _resolve(inst_name, str(func_name))(*[_convert(i) for i in args])
+
+def inst_batch(inst_name,*calls):
+    """
+    Run several instrument calls in one keyword, returns the list of responses.
+    A call is a list [func_name, arg1, ...] or a string "func_name arg1 ..."
+    eg. inst_batch    rigol    set_timebase_scale 0.001    get_timebase_scale    set_channel_coupling 'DC' 1
+    """
+    resp = []
+    for call in calls:
+        if isinstance(call, str):
+            call = shlex.split(call, posix=False)
+        resp.append(inst_func(inst_name, *call))
     return resp
 
-    
+
 ###Function wrapper for robot framework
 def plt_plot(x,y):
     return plt.plot(x,y)
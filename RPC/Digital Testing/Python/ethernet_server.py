@@ -1,32 +1,373 @@
 # -*- coding: utf-8 -*-
 # TCP Server ECHO Code
+import argparse
+import json
+import math
+import os
+import selectors
 import socket
 import signal
 import sys
- 
+import threading
+import time
+
 """
-NOTE: Signal library behave differently on Windows/Mac, 
+NOTE: Signal library behave differently on Windows/Mac,
 Ctrl+C does not work on Windows (Unable to break the socket)
+
+Usage:
+    python ethernet_server.py                   echo server on port 7, prints every packet
+    python ethernet_server.py --quiet           no printing per packet/connection
+    python ethernet_server.py --load 127.0.0.1  load-generator client against a running server
+    python ethernet_server.py --benchmark 127.0.0.1 --sizes 64,1024 --concurrency 1,8 --duration 5
+                                                JSON lines of MB/s, p50/p99/p999 round-trip time and errors
+    python ethernet_server.py --selftest        same benchmark against a local server over loopback
 """
 
-def signal_handler(signal, frame):
-    print ('You pressed Ctrl+C!')
-    s.close()
-    sys.exit(0)
- 
-signal.signal(signal.SIGINT, signal_handler)
- 
-print ('Server Running at ', socket.gethostbyname(socket.gethostname()) )
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-s.bind(('',7)) #Any address, Any port
-s.listen(1)
- 
-while True:
-    conn, addr = s.accept()
-    print ('Connected by', addr)
-    while True:
-        data = conn.recv(1024)
-        print(data)
-        if not data: break
-        conn.sendall(data)
-    conn.close()
\ No newline at end of file
+ECHO_PORT = 7
+BUFFER_SIZE = 65536
+
+
+class Connection():
+    """
+    One client of the echo server, with a preallocated receive buffer and throughput/latency statistics.
+    Latency is the time from receiving a chunk to having echoed all of it.
+    """
+    def __init__(self, sock, addr, buffer_size=BUFFER_SIZE):
+        self.sock = sock
+        self.addr = addr
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.pending = None
+        self.received = 0
+        self.packets = 0
+        self.start = time.perf_counter()
+        self.recv_time = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def echoed(self):
+        latency = time.perf_counter() - self.recv_time
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def stats(self):
+        """
+        Return a dict of bytes, packets, duration (s), throughput (MB/s) and mean/max latency (s)
+        """
+        duration = time.perf_counter() - self.start
+        return {'client': '{}:{}'.format(*self.addr[:2]),
+                'bytes': self.received,
+                'packets': self.packets,
+                'duration': duration,
+                'throughput': self.received / duration / 1e6 if duration else 0.0,
+                'latency_mean': self.latency_total / self.packets if self.packets else 0.0,
+                'latency_max': self.latency_max}
+
+
+class EchoServer():
+    def __init__(self, host='', port=ECHO_PORT, quiet=False, print_data=True, buffer_size=BUFFER_SIZE):
+        """
+        Echo server for many concurrent clients using selectors.
+        quiet: print nothing per packet or connection
+        print_data: print every received packet (ignored when quiet)
+        """
+        self.quiet = quiet
+        self.print_data = print_data and not quiet
+        self.buffer_size = buffer_size
+        self.closed = []  # stats of closed connections
+        self.sel = selectors.DefaultSelector()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(128)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.sel.register(self.sock, selectors.EVENT_READ, None)
+        self._running = False
+        self._thread = None
+
+    def _accept(self):
+        sock, addr = self.sock.accept()
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = Connection(sock, addr, self.buffer_size)
+        self.sel.register(sock, selectors.EVENT_READ, conn)
+        if not self.quiet:
+            print('Connected by', addr)
+
+    def _close(self, conn):
+        self.sel.unregister(conn.sock)
+        conn.sock.close()
+        stats = conn.stats()
+        self.closed.append(stats)
+        if not self.quiet:
+            print('Closed {client}: {bytes} bytes, {throughput:.3f} MB/s, latency mean {latency_mean:.6f} s max {latency_max:.6f} s'.format(**stats))
+
+    def _flush(self, conn):
+        # Echo what is left, wait for EVENT_WRITE if the socket buffer is full
+        try:
+            sent = conn.sock.send(conn.pending)
+        except BlockingIOError:
+            sent = 0
+        conn.pending = conn.pending[sent:]
+        if len(conn.pending):
+            self.sel.modify(conn.sock, selectors.EVENT_WRITE, conn)
+        else:
+            conn.pending = None
+            conn.echoed()
+            self.sel.modify(conn.sock, selectors.EVENT_READ, conn)
+
+    def _read(self, conn):
+        try:
+            n = conn.sock.recv_into(conn.buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            n = 0
+        if not n:
+            self._close(conn)
+            return
+        conn.recv_time = time.perf_counter()
+        conn.received += n
+        conn.packets += 1
+        if self.print_data:
+            print(bytes(conn.view[:n]))
+        # The buffer is not read into again until this chunk is echoed, no copy needed
+        conn.pending = conn.view[:n]
+        try:
+            self._flush(conn)
+        except OSError:
+            self._close(conn)
+
+    def serve_forever(self):
+        self._running = True
+        while self._running:
+            for key, mask in self.sel.select(timeout=0.5):
+                conn = key.data
+                if conn is None:
+                    self._accept()
+                elif mask & selectors.EVENT_WRITE:
+                    try:
+                        self._flush(conn)
+                    except OSError:
+                        self._close(conn)
+                else:
+                    self._read(conn)
+
+    def start(self):
+        """
+        Serve in a background thread, e.g. for a loopback self-test
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._running = False
+
+    def close(self):
+        self.stop()
+        # Let the serving thread leave select() before its connections are closed
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for key in list(self.sel.get_map().values()):
+            if key.data is not None:
+                self._close(key.data)
+        self.sel.close()
+        self.sock.close()
+
+    def connections(self):
+        """
+        Return the stats of open connections
+        """
+        return [key.data.stats() for key in list(self.sel.get_map().values()) if key.data is not None]
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of sorted values, p in 0..100
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(math.ceil(p / 100.0 * len(values))) - 1))]
+
+
+def _client(host, port, size, deadline, count, timeout, rtts):
+    # One benchmark connection, echoes are checked against the payload
+    # Returns the number of errors, reconnects after an error until the deadline/count
+    # Failed attempts count toward count, so an unreachable server cannot stall a count run
+    payload = os.urandom(size)
+    view = memoryview(bytearray(size))
+    errors = 0
+    attempts = 0
+    s = None
+    while attempts < count and time.perf_counter() < deadline:
+        attempts += 1
+        try:
+            if s is None:
+                s = socket.create_connection((host, port), timeout)
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            t = time.perf_counter()
+            s.sendall(payload)
+            got = 0
+            while got < size:
+                n = s.recv_into(view[got:])
+                if not n:
+                    raise ConnectionError('Server closed the connection')
+                got += n
+            rtt = time.perf_counter() - t
+            if view != payload:
+                errors += 1
+            else:
+                rtts.append(rtt)
+        except OSError:
+            errors += 1
+            if s is not None:
+                s.close()
+                s = None
+            time.sleep(timeout / 10)
+    if s is not None:
+        s.close()
+    return errors
+
+
+def benchmark(host='127.0.0.1', port=ECHO_PORT, size=1024, clients=1, duration=1.0, count=None, timeout=1.0):
+    """
+    Drive the echo path with clients concurrent connections, each sending size byte messages
+    and waiting for the echo, for duration seconds or count messages per client.
+    A count run is bounded to count * timeout seconds.
+    Returns a dict of MB/s (payload echoed per second), round-trip times (s) and error count,
+    errors are failed connections/transfers and corrupted echoes.
+    """
+    size, clients = int(size), int(clients)
+    count = float('inf') if count is None else int(count)
+    rtts = [[] for _ in range(clients)]
+    errors = [0] * clients
+    deadline = time.perf_counter() + (float(duration) if count == float('inf') else count * float(timeout))
+
+    def run(i):
+        errors[i] = _client(host, int(port), size, deadline, count, float(timeout), rtts[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    all_rtts = sorted(r for client in rtts for r in client)
+    total = size * len(all_rtts)
+    return {'size': size,
+            'clients': clients,
+            'duration': elapsed,
+            'messages': len(all_rtts),
+            'bytes': total,
+            'throughput': total / elapsed / 1e6 if elapsed else 0.0,
+            'rtt_mean': sum(all_rtts) / len(all_rtts) if all_rtts else 0.0,
+            'rtt_p50': percentile(all_rtts, 50),
+            'rtt_p99': percentile(all_rtts, 99),
+            'rtt_p999': percentile(all_rtts, 99.9),
+            'rtt_max': all_rtts[-1] if all_rtts else 0.0,
+            'errors': sum(errors)}
+
+
+def load(host='127.0.0.1', port=ECHO_PORT, size=1024, count=1000, clients=1):
+    """
+    Load-generator client: clients connections each send count messages of size bytes
+    and wait for the echo. Returns total bytes echoed, MB/s and mean round-trip time (s).
+    """
+    result = benchmark(host, port, size, clients, count=count)
+    return {key: result[key] for key in ('bytes', 'throughput', 'rtt_mean')}
+
+
+def sweep(host='127.0.0.1', port=ECHO_PORT, sizes=(64, 1024, 65536), clients=(1, 8), duration=1.0):
+    """
+    Run benchmark() for every combination of message size and concurrency, returns a list of results
+    """
+    return [benchmark(host, port, size, n, duration) for size in sizes for n in clients]
+
+
+def selftest(sizes=(64, 1024, 65536), clients=(1, 8), duration=1.0):
+    """
+    Run sweep() against a quiet echo server on loopback
+    """
+    server = EchoServer('127.0.0.1', 0, quiet=True)
+    server.start()
+    try:
+        return sweep('127.0.0.1', server.port, sizes, clients, duration)
+    finally:
+        server.close()
+
+
+def _ints(value):
+    # Robot passes lists as strings, e.g. "64,1024"
+    if isinstance(value, str):
+        return [int(v) for v in value.split(',')]
+    return [int(v) for v in value]
+
+
+def Ethernet_benchmark(host, port=ECHO_PORT, size=1024, clients=1, duration=1.0):
+    """
+    Keyword: benchmark an echo server, returns a JSON result dict\n
+    e.g. ${result}    Ethernet_benchmark    192.168.1.52    7    1024    4    5\n
+         ${result}    Evaluate    json.loads($result)    json\n
+         Should Be Equal As Integers    ${result}[errors]    0
+    """
+    return json.dumps(benchmark(host, port, size, clients, float(duration)))
+
+
+def Ethernet_sweep(host, port=ECHO_PORT, sizes='64,1024,65536', clients='1,8', duration=1.0):
+    """
+    Keyword: benchmark every size/concurrency combination, returns a JSON list of result dicts
+    """
+    return json.dumps(sweep(host, port, _ints(sizes), _ints(clients), float(duration)))
+
+
+def Ethernet_selftest(sizes='64,1024,65536', clients='1,8', duration=1.0):
+    """
+    Keyword: benchmark a local echo server over loopback, returns a JSON list of result dicts
+    """
+    return json.dumps(selftest(_ints(sizes), _ints(clients), float(duration)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='TCP echo server')
+    parser.add_argument('--port', type=int, default=ECHO_PORT)
+    parser.add_argument('--quiet', action='store_true', help='no printing per packet/connection')
+    parser.add_argument('--no-data', action='store_true', help='do not print packets')
+    parser.add_argument('--load', metavar='HOST', help='run the load generator against HOST instead')
+    parser.add_argument('--benchmark', metavar='HOST', help='run the benchmark against HOST instead')
+    parser.add_argument('--selftest', action='store_true', help='run the benchmark over loopback instead')
+    parser.add_argument('--size', type=int, default=1024)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=1)
+    parser.add_argument('--sizes', default='64,1024,65536', help='benchmark message sizes')
+    parser.add_argument('--concurrency', default='1,8', help='benchmark numbers of clients')
+    parser.add_argument('--duration', type=float, default=1.0, help='benchmark seconds per run')
+    args = parser.parse_args()
+
+    if args.load:
+        print(load(args.load, args.port, args.size, args.count, args.clients))
+        sys.exit(0)
+    if args.benchmark or args.selftest:
+        sizes, clients = _ints(args.sizes), _ints(args.concurrency)
+        if args.selftest:
+            results = selftest(sizes, clients, args.duration)
+        else:
+            results = sweep(args.benchmark, args.port, sizes, clients, args.duration)
+        for result in results:
+            print(json.dumps(result))
+        sys.exit(1 if any(r['errors'] for r in results) else 0)
+
+    server = EchoServer('', args.port, args.quiet, not args.no_data)
+
+    def signal_handler(signal, frame):
+        print ('You pressed Ctrl+C!')
+        server.close()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    print ('Server Running at ', socket.gethostbyname(socket.gethostname()) )
+    server.serve_forever()
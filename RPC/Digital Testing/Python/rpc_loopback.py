@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+''' Stand-in Mbed RPC target on a local pty, to try HATS_RPC_Functions without a board.
+ASCII commands are answered with "<command> done", binary frames with a binary frame of the same text.
+Run it and pass the printed port to RPC_setport, e.g. python3 rpc_loopback.py '''
+import binascii
+import os
+import pty
+import struct
+import threading
+import time
+import tty
+import HATS_RPC_Functions as rpc
+
+
+class LoopbackTarget():
+    def __init__(self, delay=0):
+        """
+        delay: seconds the target takes to execute a command
+        """
+        self.delay = delay
+        self.commands = 0
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self.port
+
+    def _read(self, n):
+        data = b''
+        while len(data) < n:
+            data += os.read(self.master, n - len(data))
+        return data
+
+    def _answer(self, text):
+        self.commands += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return text + ' done'
+
+    def run(self):
+        line = b''
+        try:
+            while True:
+                b = self._read(1)
+                if b[0] == rpc.SYNC:
+                    header = self._read(2)
+                    payload = self._read(struct.unpack('>H', header)[0])
+                    crc = struct.unpack('>H', self._read(2))[0]
+                    if crc != binascii.crc_hqx(header + payload, 0xFFFF):
+                        continue
+                    fields = []
+                    i = 0
+                    while i < len(payload):
+                        fields.append(payload[i + 1:i + 1 + payload[i]])
+                        i += 1 + payload[i]
+                    text = ' '.join(f.decode('utf-8', 'replace') for f in fields)
+                    os.write(self.master, rpc._frame(self._answer(text).encode('utf-8')))
+                elif b == b'\n':
+                    if line.strip():
+                        os.write(self.master, (self._answer(line.strip().decode()) + '\n').encode())
+                    line = b''
+                else:
+                    line += b
+        except OSError:
+            return
+
+
+if __name__ == "__main__":
+    target = LoopbackTarget()
+    print(target.start())
+    while True:
+        time.sleep(1)
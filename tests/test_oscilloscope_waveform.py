@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HATS"))
+import HATS_VISA_oscilloscope as hv_osc
+
+
+def test_scale_byte_waveform():
+    # :WAV:PRE? of a 1200 point BYTE (format 0) screen read: 0,0,1200,1,xinc,xorig,xref,yinc,yorig,yref
+    preamble = (0, 0, 1200, 1, 1e-6, -6e-4, 0, 0.04, 0, 127)
+    codes = np.arange(1200, dtype=np.uint16) % 256
+    buff = bytes(bytearray(codes.astype(np.uint8)))
+    scope = hv_osc.oscilloscope.__new__(hv_osc.oscilloscope)
+    x_axis, volts = scope._scale_waveform(preamble, buff)
+    assert len(x_axis) == len(volts) == 1200
+    assert np.allclose(volts, (codes.astype(np.float64) - 127) * 0.04)
+    assert np.isclose(x_axis[0], -6e-4) and np.isclose(x_axis[-1], -6e-4 + 1199e-6)
+
+
+def test_scale_word_waveform():
+    preamble = (1, 0, 4, 1, 1e-6, 0.0, 0, 0.01, 0, 32768)
+    codes = np.array([0, 32768, 40000, 65535], dtype="<u2")
+    x_axis, volts = hv_osc.oscilloscope.__new__(hv_osc.oscilloscope)._scale_waveform(preamble, codes.tobytes())
+    assert len(volts) == 4
+    assert np.allclose(volts, (codes.astype(np.float64) - 32768) * 0.01)